@@ -1,11 +1,25 @@
 from typing import Annotated
 
-from api.v1.models import PaginatedParams
-from fastapi import Query
+from api.v1.models import CountMode, PaginatedParams, decode_cursor
+from fastapi import HTTPException, Query, status
 
 
 async def paginator_params_dep(
     page_size: Annotated[int, Query(description="Pagination page size", ge=1)] = 20,
     page_number: Annotated[int, Query(description="Pagination page number", ge=1)] = 1,
+    cursor: Annotated[
+        str | None,
+        Query(description="Opaque cursor of the next page, `next_cursor` of the previous one"),
+    ] = None,
+    count: Annotated[
+        CountMode | None,
+        Query(description="Total count: exact, estimated from table statistics or none; none by default with a cursor"),
+    ] = None,
 ) -> PaginatedParams:
-    return PaginatedParams(page_size=page_size, page_number=page_number)
+    try:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if count is None:
+        count = CountMode.NONE if cursor is not None else CountMode.EXACT
+    return PaginatedParams(page_size=page_size, page_number=page_number, after=after, count=count)
@@ -1,35 +1,80 @@
+import base64
+import enum
+import json
 from datetime import datetime
 from math import ceil
 from typing import Any
 from uuid import UUID
 
-from pydantic import AliasPath, BaseModel, Field
+from pydantic import AliasChoices, AliasPath, BaseModel, Field
+
+
+class CountMode(str, enum.Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+
+def encode_cursor(created_at: datetime, entity_id: UUID) -> str:
+    """Opaque cursor pointing after the `(created_at, id)` keyset position of an entity."""
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), str(entity_id)]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """
+    Keyset position of a cursor made by `encode_cursor`.
+
+    Raises:
+        ValueError: The cursor is malformed.
+    """
+    try:
+        created_at, entity_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), UUID(entity_id)
+    except (TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
 
 
 class PaginatedParams(BaseModel):
     page_size: int = Field(ge=1, default=20)
     page_number: int = Field(ge=1, default=1)
+    # keyset position to continue after, page_number is ignored when set
+    after: tuple[datetime, UUID] | None = None
+    count: CountMode = CountMode.EXACT
 
 
 class Paginations(BaseModel):
-    count: int
-    total_pages: int
+    count: int | None
+    total_pages: int | None
     next: int | None
     prev: int | None
-    page: int
+    page: int | None
+    next_cursor: str | None = None
     results: Any
 
     @classmethod
     def calculate_pages(cls, results, item_count, paginated_params: PaginatedParams):
         page_size = paginated_params.page_size
         page_number = paginated_params.page_number
-        total_page = ceil(item_count / page_size)
+        total_page = ceil(item_count / page_size) if item_count is not None else None
+        next_cursor = encode_cursor(results[-1].created_at, results[-1].id) if len(results) == page_size else None
+        has_next = page_number < total_page if total_page is not None else next_cursor is not None
+        if paginated_params.after is not None:
+            return cls(
+                count=item_count,
+                total_pages=total_page,
+                prev=None,
+                next=None,
+                page=None,
+                next_cursor=next_cursor,
+                results=results,
+            )
         return cls(
             count=item_count,
             total_pages=total_page,
             prev=page_number - 1 if page_number > 1 else None,
-            next=page_number + 1 if page_number < total_page else None,
+            next=page_number + 1 if has_next else None,
             page=page_number,
+            next_cursor=next_cursor,
             results=results,
         )
 
@@ -39,11 +84,20 @@ class UserSubscriptions(BaseModel):
         from_attributes = True
 
     subscription_id: UUID
-    name: str = Field(alias=AliasPath(["subscription", "name"]))
+    name: str = Field(validation_alias=AliasChoices("name", AliasPath("subscription", "name")))
     expired: datetime
     auto_prolong: bool
 
 
+class BulkUsersRequest(BaseModel):
+    user_ids: list[UUID] = Field(min_length=1, max_length=5000)
+
+
+class UserActiveSubscriptions(BaseModel):
+    user_id: UUID
+    subscriptions: list[UserSubscriptions]
+
+
 class Subscriptions(BaseModel):
     class Config:
         from_attributes = True
@@ -19,7 +19,7 @@ async def get_subscription_list(
     service: SubscriptionsService = Depends(get_subscriptions_service),
 ) -> Any:
     results = await service.get_list(paginated_params, filters={})
-    count = await service.count(filters={})
+    count = await service.count(filters={}, mode=paginated_params.count)
     return Paginations.calculate_pages(results, count, paginated_params)
 
 
@@ -1,9 +1,10 @@
-from typing import Any
+from typing import Any, AsyncIterator
 from uuid import UUID
 
-from api.v1.models import UserSubscriptions
+from api.v1.models import BulkUsersRequest, UserActiveSubscriptions, UserSubscriptions
 from fastapi import APIRouter, Depends, Request
-from core.dependencies import check_access_active_subscription_endpoint, oauth2_scheme
+from fastapi.responses import StreamingResponse
+from core.dependencies import check_access_active_subscription_endpoint, check_access_roles_endpoint, oauth2_scheme
 from services.repositories import UsersSubscriptionsService
 from services.services import get_users_subscriptions_service
 
@@ -13,6 +14,27 @@ user_router = APIRouter(
 )
 
 
+@user_router.post(
+    "/subscriptions/active",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+@check_access_roles_endpoint(roles={"cinema"})
+async def get_active_subscriptions_bulk(
+    body: BulkUsersRequest,
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    user_subscriptions_service: UsersSubscriptionsService = Depends(get_users_subscriptions_service),
+) -> StreamingResponse:
+    """Active subscriptions of up to 5000 users, one `UserActiveSubscriptions` JSON object per line."""
+
+    async def lines() -> AsyncIterator[str]:
+        async for user_id, subscriptions in user_subscriptions_service.get_active_subscriptions_bulk(body.user_ids):
+            yield UserActiveSubscriptions(user_id=user_id, subscriptions=subscriptions).model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @user_router.get(
     "/{user_id}/subscriptions/active",
     response_model=list[UserSubscriptions],
@@ -1,8 +1,10 @@
 import os
 
 from dotenv import load_dotenv
-from opentelemetry import trace
+from opentelemetry import metrics, trace
 from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+from opentelemetry.exporter.prometheus import PrometheusMetricReader
+from opentelemetry.sdk.metrics import MeterProvider
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
@@ -17,6 +19,12 @@ class RedisSettings(BaseSettings):
     dsn: RedisDsn
 
 
+class CacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="cache_")
+    key_prefix: str = "active_subscriptions"
+    active_subscriptions_ttl: int = 60
+
+
 class FastApiSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="fastapi_")
     host: str
@@ -29,6 +37,13 @@ class FastApiSettings(BaseSettings):
 class PostgresSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="postgres_")
     dsn: PostgresDsn
+    pool_enabled: bool = True
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = True
+    pool_recycle: int = 1800
+    statement_cache_size: int = 100
 
 
 class JaegerSetting(BaseSettings):
@@ -37,6 +52,12 @@ class JaegerSetting(BaseSettings):
     agent_port: int = 6831
 
 
+class MetricsSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="metrics_")
+    host: str = "0.0.0.0"
+    port: int = 9100
+
+
 class LogstashSettings(BaseSettings):
     host: str
     port: int
@@ -48,6 +69,11 @@ class AuthSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="auth_")
     base_url: HttpUrl
     login_redirect_url: HttpUrl
+    jwks_url: HttpUrl | None = None
+    jwks_refresh_interval: int = 300
+    jwt_algorithms: list[str] = ["RS256"]
+    revocation_check_interval: int = 300
+    token_cache_size: int = 10000
 
 
 class JWTAuthSettings(BaseSettings):
@@ -60,12 +86,15 @@ class JWTAuthSettings(BaseSettings):
 
 class settings:
     redis = RedisSettings()
+    cache = CacheSettings()
     postgres = PostgresSettings()
     app = FastApiSettings()
     auth = AuthSettings()
     jaeger = JaegerSetting()
     logstash = LogstashSettings()
+    metrics = MetricsSettings()
     tracer_enable = bool(int(os.getenv("TRACER_ENABLE")))
+    metrics_enable = bool(int(os.getenv("METRICS_ENABLE", "0")))
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     auth_jwt = JWTAuthSettings()
 
@@ -81,5 +110,14 @@ def configure_tracer() -> None:
     )
 
 
+def configure_meter() -> None:
+    # instruments are exported in the Prometheus format, served on the internal METRICS_HOST:METRICS_PORT
+    resource = Resource(attributes={"service.name": settings.app.project_name})
+    metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[PrometheusMetricReader()]))
+
+
 if settings.tracer_enable:
     configure_tracer()
+
+if settings.metrics_enable:
+    configure_meter()
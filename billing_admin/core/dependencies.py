@@ -1,83 +1,271 @@
+import logging
+from collections import OrderedDict
 from functools import wraps
+from typing import NamedTuple
 
 import aiohttp
 import jwt
 from fastapi import HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from opentelemetry import trace
+from opentelemetry import metrics, trace
+from core import jwks
 from db import redis
 from time import time
 from models.token import TokenInfo
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=str(settings.auth.login_redirect_url))
 tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+token_cache_hits = meter.create_counter(
+    "auth.token_cache.hits",
+    description="Access decisions served from the token cache, by tier",
+)
+token_cache_misses = meter.create_counter(
+    "auth.token_cache.misses",
+    description="Access decisions missing from the token cache, by tier",
+)
+
+http_session: aiohttp.ClientSession
 
 
 async def get_token_roles(request: Request, token=str) -> set[str]:
     with tracer.start_as_current_span("check-token-request"):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{settings.auth.base_url}roles",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "x-request-id": request.headers.get("x-request-id"),
-                    },
-                ) as response:
-                    if response.status != status.HTTP_200_OK:
-                        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Auth Error")
-                    return set(await response.json())
+            async with http_session.get(
+                f"{settings.auth.base_url}roles",
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "x-request-id": request.headers.get("x-request-id"),
+                },
+            ) as response:
+                if response.status >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                    raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Auth service is failing")
+                if response.status != status.HTTP_200_OK:
+                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Auth Error")
+                return set(await response.json())
+        except HTTPException:
+            raise
         except Exception:
             raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Auth service is not responding")
 
 
+def verify_token(token: str) -> TokenInfo | None:
+    """
+    Verify the token locally against the auth service's public keys.
+
+    Args:
+        token (str): The access token.
+
+    Returns:
+        TokenInfo | None: Verified token claims, None when the keys are not available.
+    """
+    if jwks.jwks_client is None:
+        return None
+    with tracer.start_as_current_span("verify-token-locally"):
+        try:
+            return jwks.jwks_client.verify(token)
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+
+async def check_revocation(request: Request, token: str, token_data: TokenInfo) -> set[str]:
+    """
+    Current roles of a locally verified token, from the auth service that rejects revoked tokens.
+
+    While the auth service is unavailable the verified claims are used, an outage does not lock users out.
+
+    Args:
+        request (Request): The incoming request.
+        token (str): The access token.
+        token_data (TokenInfo): Verified token claims.
+
+    Returns:
+        set[str]: Roles of the token.
+    """
+    try:
+        return await get_token_roles(request, token)
+    except HTTPException as error:
+        if error.status_code == status.HTTP_401_UNAUTHORIZED:
+            raise
+        logger.warning("Revocation check failed (%s), using the verified claims", error.detail)
+        return token_data.roles
+
+
+def decision_expiry(token_data: TokenInfo) -> float:
+    """Time until which a decision on the token is cached: its expiry, capped by the revocation check interval."""
+    if settings.auth.revocation_check_interval <= 0:
+        return token_data.exp
+    return min(token_data.exp, time() + settings.auth.revocation_check_interval)
+
+
+class TokenDecision(NamedTuple):
+    user: str
+    allowed: bool
+    expires_at: float
+
+
+class TokenDecisionCache:
+    def __init__(self, maxsize: int):
+        """
+        Bounded in-process LRU of access decisions, in front of the Redis token cache.
+
+        Args:
+            maxsize (int): Maximum number of cached tokens.
+        """
+        self.maxsize = maxsize
+        self.decisions: OrderedDict[tuple[str, frozenset[str]], TokenDecision] = OrderedDict()
+
+    def get(self, token: str, roles: frozenset[str]) -> TokenDecision | None:
+        decision = self.decisions.get((token, roles))
+        if decision is None:
+            return None
+        if decision.expires_at <= time():
+            del self.decisions[(token, roles)]
+            return None
+        self.decisions.move_to_end((token, roles))
+        return decision
+
+    def set(self, token: str, roles: frozenset[str], decision: TokenDecision) -> None:
+        self.decisions[(token, roles)] = decision
+        self.decisions.move_to_end((token, roles))
+        while len(self.decisions) > self.maxsize:
+            self.decisions.popitem(last=False)
+
+
+token_decisions = TokenDecisionCache(settings.auth.token_cache_size)
+
+
+def decision_key(token: str, roles: frozenset[str]) -> str:
+    """Redis key of the decision for the token on endpoints allowing these roles."""
+    return f"{token}:{','.join(sorted(roles))}"
+
+
+async def get_cached_decision(token: str, roles: frozenset[str]) -> TokenDecision | None:
+    decision = token_decisions.get(token, roles)
+    if decision is not None:
+        token_cache_hits.add(1, {"tier": "memory"})
+        return decision
+    token_cache_misses.add(1, {"tier": "memory"})
+    cached = await redis.redis_interface.get(decision_key(token, roles))
+    if cached is None:
+        token_cache_misses.add(1, {"tier": "redis"})
+        return None
+    token_cache_hits.add(1, {"tier": "redis"})
+    token_data = TokenInfo(**jwt.decode(token, options={"verify_signature": False}))
+    decision = TokenDecision(
+        user=token_data.user,
+        allowed=cached == "1",
+        expires_at=decision_expiry(token_data),
+    )
+    token_decisions.set(token, roles, decision)
+    return decision
+
+
+async def decide(token: str, roles: frozenset[str], request: Request) -> TokenDecision:
+    """
+    Decide whether the token holds one of the roles and cache the decision in both tiers.
+
+    A locally verified token is decided on its claims alone when revocation checks are off
+    (AUTH_REVOCATION_CHECK_INTERVAL=0). Otherwise it is decided on the current roles the auth service
+    returns for it, once per revocation check interval, falling back to its claims when the auth service
+    is unavailable. Tokens that can't be verified locally are decided on the roles from the auth service.
+
+    Args:
+        token (str): The access token.
+        roles (frozenset[str]): Roles allowed to access the endpoint.
+        request (Request): The incoming request.
+
+    Returns:
+        TokenDecision: The decision and its expiry.
+    """
+    token_data = verify_token(token)
+    if token_data is not None:
+        if settings.auth.revocation_check_interval > 0:
+            user_roles = await check_revocation(request, token, token_data)
+        else:
+            user_roles = token_data.roles
+        expires_at = decision_expiry(token_data)
+    else:
+        token_data = TokenInfo(**jwt.decode(token, options={"verify_signature": False}))
+        user_roles = await get_token_roles(request, token)
+        expires_at = token_data.exp
+    decision = TokenDecision(
+        user=token_data.user,
+        allowed="admin" in user_roles or bool(roles & user_roles),  # admin everything is allowed
+        expires_at=expires_at,
+    )
+    ttl = int(expires_at - time())
+    if ttl > 0:
+        await redis.redis_interface.setex(name=decision_key(token, roles), time=ttl, value=int(decision.allowed))
+        token_decisions.set(token, roles, decision)
+    return decision
+
+
+async def get_request_decision(kwargs: dict, roles: frozenset[str]) -> TokenDecision:
+    """
+    Access decision for the token a view was called with.
+
+    Args:
+        kwargs (dict): Keyword arguments of the view, holding `token` and `request`.
+        roles (frozenset[str]): Roles allowed to access the endpoint.
+
+    Returns:
+        TokenDecision: The cached or freshly made decision.
+    """
+    token: str | None = kwargs.get("token")
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="token depends error",
+        )
+    decision = await get_cached_decision(token, roles)
+    if decision is None:
+        request = kwargs.get("request")
+        if request is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="request depends error",
+            )
+        decision = await decide(token, roles, request)
+    return decision
+
+
 def check_access_active_subscription_endpoint(roles: set[str] = set()):  # noqa
+    required_roles = frozenset(roles)
+
     def inner(func):  # noqa
         @wraps(func)
         async def view_method(*args, **kwargs):  # noqa
-            token: str | None = kwargs.get("token")
-            if token is None:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="token depends error",
-                )
-            token_data = TokenInfo(**jwt.decode(token, options={"verify_signature": False}))
-            if token_data.roles & roles:
-                # check cache tokens
-                if await redis.redis_interface.get(token):
-                    return await func(*args, **kwargs)
-
-            # validate token
-            request = kwargs.get("request")
-            if request is None:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="request depends error",
-                )
-            request: Request
-            user_roles = await get_token_roles(request, token)
-
-            # checking the request for yourself
             user_id = kwargs.get("user_id")
             if user_id is None:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="user_id depends error",
                 )
-            if token_data.user == str(user_id):
-                return await func(*args, **kwargs)
-
-            # check roles permissions
-            if "admin" not in user_roles:  # admin everything is allowed
-                if not roles & user_roles:
-                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
-            if roles & user_roles:
-                await redis.redis_interface.setex(
-                    name=token,
-                    time=token_data.exp - int(time()),
-                    value=1,
-                )
+            decision = await get_request_decision(kwargs, required_roles)
+
+            # checking the request for yourself
+            if decision.user != str(user_id) and not decision.allowed:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+            return await func(*args, **kwargs)
+
+        return view_method
+
+    return inner
+
+
+def check_access_roles_endpoint(roles: set[str] = set()):  # noqa
+    required_roles = frozenset(roles)
+
+    def inner(func):  # noqa
+        @wraps(func)
+        async def view_method(*args, **kwargs):  # noqa
+            decision = await get_request_decision(kwargs, required_roles)
+            if not decision.allowed:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
             return await func(*args, **kwargs)
 
         return view_method
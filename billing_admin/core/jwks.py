@@ -0,0 +1,74 @@
+import asyncio
+import logging
+
+import aiohttp
+import jwt
+from core.config import settings
+from models.token import TokenInfo
+
+logger = logging.getLogger(__name__)
+
+jwks_client: "JWKSClient | None" = None
+
+
+class JWKSClient:
+    def __init__(self, url: str, session: aiohttp.ClientSession):
+        """
+        Public keys of the auth service, used to verify access tokens without calling it.
+
+        Args:
+            url (str): JWKS endpoint of the auth service.
+            session (aiohttp.ClientSession): Session used to fetch the key set.
+        """
+        self.url = url
+        self.session = session
+        self.keys: dict[str | None, jwt.PyJWK] = {}
+        self.refresh_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Failed to load JWKS, tokens are checked by the auth service until it is loaded")
+        self.refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def close(self) -> None:
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            self.refresh_task = None
+
+    async def refresh(self) -> None:
+        async with self.session.get(self.url) as response:
+            response.raise_for_status()
+            key_set = jwt.PyJWKSet.from_dict(await response.json())
+        self.keys = {key.key_id: key for key in key_set.keys}
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.auth.jwks_refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh JWKS")
+
+    def verify(self, token: str) -> TokenInfo | None:
+        """
+        Verify the token signature and expiry against the cached keys.
+
+        Args:
+            token (str): The access token.
+
+        Returns:
+            TokenInfo | None: Verified token claims, None if the signing key is not known (yet).
+
+        Raises:
+            jwt.InvalidTokenError: The token is malformed, expired or its signature does not match.
+        """
+        key_id = jwt.get_unverified_header(token).get("kid")
+        key = self.keys.get(key_id)
+        if key is None and key_id is None and len(self.keys) == 1:
+            key = next(iter(self.keys.values()))
+        if key is None:
+            return None
+        claims = jwt.decode(token, key.key, algorithms=settings.auth.jwt_algorithms)
+        return TokenInfo(**claims)
@@ -0,0 +1,35 @@
+from time import perf_counter
+
+from opentelemetry import metrics
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+meter = metrics.get_meter(__name__)
+checkouts_counter = meter.create_counter(
+    "db.pool.checkouts",
+    description="Connections checked out of the pool",
+)
+timeouts_counter = meter.create_counter(
+    "db.pool.timeouts",
+    description="Checkouts that timed out waiting for a free connection",
+)
+wait_histogram = meter.create_histogram(
+    "db.pool.checkout_wait",
+    unit="s",
+    description="Time spent waiting for a pooled connection",
+)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout counts and the time spent waiting for a connection."""
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            timeouts_counter.add(1)
+            raise
+        checkouts_counter.add(1)
+        wait_histogram.record(perf_counter() - started)
+        return connection
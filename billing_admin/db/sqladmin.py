@@ -7,7 +7,10 @@ from db.models import (
     UserSubscription,
     UserFreezeSubscription,
 )
+from db import redis
+from services.cache import ActiveSubscriptionsCache
 from sqladmin import ModelView
+from starlette.requests import Request
 
 
 class MixinExcludeClass:
@@ -30,6 +33,14 @@ class SubscribersAdmin(MixinExcludeClass, ModelView, model=Subscription):
         Subscription.tariffs: "Tariffs",
     }
 
+    # subscription names are part of every cached entry
+    async def after_model_change(self, data: dict, model: Subscription, is_created: bool, request: Request) -> None:
+        if not is_created:
+            await ActiveSubscriptionsCache(redis.redis_interface).invalidate_all()
+
+    async def after_model_delete(self, model: Subscription, request: Request) -> None:
+        await ActiveSubscriptionsCache(redis.redis_interface).invalidate_all()
+
 
 class TariffsAdmin(MixinExcludeClass, ModelView, model=Tariff):
     column_list = [
@@ -51,17 +62,20 @@ class TariffsAdmin(MixinExcludeClass, ModelView, model=Tariff):
 
 
 class TransactionsAdmin(MixinExcludeClass, ModelView, model=Transaction):
+    form_excluded_columns = ["created_at", "state", "state_updated_at"]
     column_list = [
         Transaction.user_id,
         Transaction.payment_id,
         Transaction.tariff,
         Transaction.id,
+        Transaction.state,
     ]
     column_labels = {
         Transaction.user_id: "User Id",
         Transaction.payment_id: "Payment Id",
         Transaction.tariff: "Tariff name",
         Transaction.id: "Transaction id",
+        Transaction.state: "State",
     }
 
 
@@ -77,6 +91,19 @@ class UserSubscriptionAdmin(MixinExcludeClass, ModelView, model=UserSubscription
         UserSubscription.expired: "Expire on",
     }
 
+    async def on_model_change(self, data: dict, model: UserSubscription, is_created: bool, request: Request) -> None:
+        # the user of an edited subscription may change, both users' entries are dropped after the commit
+        request.state.previous_user_id = None if is_created else model.user_id
+
+    async def after_model_change(self, data: dict, model: UserSubscription, is_created: bool, request: Request) -> None:
+        await ActiveSubscriptionsCache(redis.redis_interface).invalidate(
+            getattr(request.state, "previous_user_id", None),
+            model.user_id,
+        )
+
+    async def after_model_delete(self, model: UserSubscription, request: Request) -> None:
+        await ActiveSubscriptionsCache(redis.redis_interface).invalidate(model.user_id)
+
 
 class UserFreezeSubscriptionAdmin(MixinExcludeClass, ModelView, model=UserFreezeSubscription):
     column_list = [
@@ -2,7 +2,9 @@ import logging
 from contextlib import asynccontextmanager
 from logging import config as logging_config
 
+import aiohttp
 from api.v1 import subscriptions, users
+from core import dependencies, jwks
 from core.config import settings
 from core.logger import LOGGING, RequestIdFilter
 from db import postgres
@@ -21,6 +23,7 @@ from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from db import redis
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from prometheus_client import start_http_server
 from sqladmin import Admin
 
 
@@ -32,9 +35,20 @@ async def lifespan(_):
         encoding="utf8",
         decode_responses=True,
     )
+    dependencies.http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+    if settings.auth.jwks_url is not None:
+        jwks.jwks_client = jwks.JWKSClient(str(settings.auth.jwks_url), dependencies.http_session)
+        await jwks.jwks_client.start()
     await postgres.create_database()
+    if settings.metrics_enable:
+        # a separate internal port, the app itself is public
+        start_http_server(settings.metrics.port, settings.metrics.host)
     yield
+    if jwks.jwks_client is not None:
+        await jwks.jwks_client.close()
+    await dependencies.http_session.close()
     await redis.redis_interface.close()
+    await postgres.engine.dispose()
     # await postgres.purge_database()
 
 
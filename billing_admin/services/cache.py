@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+from math import ceil
+from uuid import UUID
+
+from core.config import settings
+from opentelemetry import metrics
+from redis.asyncio import Redis
+from sqlalchemy import Row
+
+meter = metrics.get_meter(__name__)
+hits_counter = meter.create_counter(
+    "cache.active_subscriptions.hits",
+    description="Active subscriptions served from the cache",
+)
+misses_counter = meter.create_counter(
+    "cache.active_subscriptions.misses",
+    description="Active subscriptions loaded from the database",
+)
+
+
+class ActiveSubscriptionsCache:
+    def __init__(self, redis: Redis):
+        """
+        Read-through cache of the active subscriptions of a user.
+
+        An entry lives until the first of the cached subscriptions expires,
+        at most `CACHE_ACTIVE_SUBSCRIPTIONS_TTL` seconds.
+
+        Args:
+            redis (Redis): The Redis client.
+        """
+        self.redis = redis
+
+    async def get(self, user_id: UUID) -> list[dict] | None:
+        value = await self.redis.get(self._key(user_id))
+        if value is None:
+            misses_counter.add(1)
+            return None
+        hits_counter.add(1)
+        return json.loads(value)
+
+    async def set(self, user_id: UUID, subscriptions: list[Row]) -> None:
+        ttl = settings.cache.active_subscriptions_ttl
+        if subscriptions:
+            earliest = min(subscription.expired for subscription in subscriptions)
+            ttl = min(ttl, ceil((earliest - datetime.now()).total_seconds()))
+        if ttl <= 0:
+            return
+        value = json.dumps(
+            [
+                {
+                    "subscription_id": str(subscription.subscription_id),
+                    "name": subscription.name,
+                    "expired": subscription.expired.isoformat(),
+                    "auto_prolong": subscription.auto_prolong,
+                }
+                for subscription in subscriptions
+            ],
+        )
+        await self.redis.setex(self._key(user_id), ttl, value)
+
+    async def invalidate(self, *user_ids: UUID) -> None:
+        keys = [self._key(user_id) for user_id in user_ids if user_id is not None]
+        if keys:
+            await self.redis.delete(*keys)
+
+    async def invalidate_all(self) -> None:
+        async for key in self.redis.scan_iter(match=f"{settings.cache.key_prefix}:*"):
+            await self.redis.delete(key)
+
+    @staticmethod
+    def _key(user_id: UUID) -> str:
+        return f"{settings.cache.key_prefix}:{user_id}"
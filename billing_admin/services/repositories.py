@@ -1,12 +1,14 @@
 from abc import ABC
 from datetime import datetime
-from typing import Generic, TypeVar
+from typing import AsyncIterator, Generic, TypeVar
 from uuid import UUID
 
-from api.v1.models import PaginatedParams
+from api.v1.models import CountMode, PaginatedParams
 from db.models import Base, Subscription, UserSubscription
+from services.cache import ActiveSubscriptionsCache
 
-from sqlalchemy import func, select
+from sqlalchemy import Row, Select, any_, bindparam, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -15,6 +17,8 @@ DBModel = TypeVar("DBModel", bound=Base)
 
 class BaseService(Generic[DBModel], ABC):
     _model = DBModel
+    # columns the read API serialises, loaded as plain rows instead of entities
+    _projection: tuple = ()
 
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -24,36 +28,105 @@ class BaseService(Generic[DBModel], ABC):
         paginated_params: PaginatedParams | None,
         filters: dict,
     ) -> list[_model]:
-        limit = paginated_params.page_size if paginated_params else None
-        offset = (paginated_params.page_number - 1) * paginated_params.page_size if paginated_params else None
-        stmt = select(self._model).filter_by(**filters).limit(limit).offset(offset)
-        results = await self.session.execute(stmt)
+        stmt = select(self._model).filter_by(**filters).order_by(self._model.created_at, self._model.id)
+        if paginated_params is None:
+            results = await self.session.execute(stmt)
+            return list(results.scalars())
+        if paginated_params.after is not None:
+            stmt = stmt.filter(tuple_(self._model.created_at, self._model.id) > paginated_params.after)
+        else:
+            stmt = stmt.offset((paginated_params.page_number - 1) * paginated_params.page_size)
+        results = await self.session.execute(stmt.limit(paginated_params.page_size))
         return list(results.scalars())
 
-    async def count(self, filters: dict) -> int:
+    async def count(self, filters: dict, mode: CountMode = CountMode.EXACT) -> int | None:
+        if mode == CountMode.NONE:
+            return None
+        if mode == CountMode.ESTIMATED and not filters:
+            estimate = await self.estimate_count()
+            if estimate is not None:
+                return estimate
         stmt = select(func.count(self._model.id)).filter_by(**filters)
         return await self.session.scalar(stmt)
 
+    async def estimate_count(self) -> int | None:
+        """Row count of the table from the planner statistics, None if it was never analyzed."""
+        stmt = text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)")
+        estimate = await self.session.scalar(stmt, {"table": self._model.__table__.fullname})
+        return estimate if estimate is not None and estimate >= 0 else None
+
     async def get_by_id(self, entity_id: UUID) -> _model:
         return await self.session.get_one(self._model, entity_id)
 
+    def projection(self) -> Select:
+        """Select of the projected columns, of the whole entity when the service declares none."""
+        return select(*self._projection) if self._projection else select(self._model)
+
 
 class UsersSubscriptionsService(BaseService[UserSubscription]):
     _model = UserSubscription
+    _projection = (
+        UserSubscription.subscription_id,
+        Subscription.name,
+        UserSubscription.expired,
+        UserSubscription.auto_prolong,
+    )
+
+    def __init__(self, session: AsyncSession, cache: ActiveSubscriptionsCache | None = None):
+        super().__init__(session)
+        self.cache = cache
+
+    def active_subscriptions(self) -> Select:
+        return (
+            self.projection()
+            .join(UserSubscription.subscription)
+            .filter(UserSubscription.expired > datetime.now())
+        )
+
+    async def get_active_subscriptions(self, entity_id: UUID) -> list[Row] | list[dict]:
+        if self.cache is not None:
+            cached = await self.cache.get(entity_id)
+            if cached is not None:
+                return cached
+        stmt = self.active_subscriptions().filter(UserSubscription.user_id == entity_id)
+        subscriptions = list(await self.session.execute(stmt))
+        if self.cache is not None:
+            await self.cache.set(entity_id, subscriptions)
+        return subscriptions
+
+    async def get_active_subscriptions_bulk(self, user_ids: list[UUID]) -> AsyncIterator[tuple[UUID, list[Row]]]:
+        """
+        Active subscriptions of many users, read with one `user_id = ANY(...)` query.
+
+        Rows are streamed from the database and grouped per user as they arrive.
 
-    async def get_active_subscriptions(self, entity_id: UUID) -> list[_model]:
+        Args:
+            user_ids (list[UUID]): The users to look up.
+
+        Yields:
+            tuple[UUID, list[Row]]: A user and their active subscriptions, an empty list
+            for the requested users without any.
+        """
+        user_ids_param = bindparam("user_ids", list(user_ids), type_=ARRAY(UserSubscription.user_id.type))
         stmt = (
-            select(self._model)
-            .filter(
-                UserSubscription.user_id == entity_id,
-                UserSubscription.expired > datetime.now(),
-            )
-            .options(
-                selectinload(self._model.subscription),
-            )
+            self.active_subscriptions()
+            .add_columns(UserSubscription.user_id)
+            .filter(UserSubscription.user_id == any_(user_ids_param))
+            .order_by(UserSubscription.user_id, UserSubscription.expired)
         )
-        results = await self.session.execute(stmt)
-        return list(results.scalars())
+        pending = dict.fromkeys(user_ids)
+        current_user, subscriptions = None, []
+        async for row in await self.session.stream(stmt):
+            if row.user_id != current_user:
+                if current_user is not None:
+                    yield current_user, subscriptions
+                current_user, subscriptions = row.user_id, []
+                pending.pop(current_user, None)
+            subscriptions.append(row)
+        if current_user is not None:
+            yield current_user, subscriptions
+        for user_id in pending:
+            yield user_id, []
 
 
 class SubscriptionsService(BaseService[Subscription]):
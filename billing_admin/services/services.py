@@ -1,10 +1,12 @@
+from db import redis
 from db.postgres import async_session
+from services.cache import ActiveSubscriptionsCache
 from services.repositories import SubscriptionsService, UsersSubscriptionsService
 
 
 async def get_users_subscriptions_service():
     async with async_session() as session:
-        yield UsersSubscriptionsService(session)
+        yield UsersSubscriptionsService(session, ActiveSubscriptionsCache(redis.redis_interface))
 
 
 async def get_subscriptions_service():
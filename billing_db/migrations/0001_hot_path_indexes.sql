@@ -0,0 +1,19 @@
+-- Indexes for the scheduler and admin API access paths.
+-- CONCURRENTLY cannot run inside a transaction block: apply with autocommit, e.g.
+--   psql "$POSTGRES_DSN" -f 0001_hot_path_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tariffs_subscription_id
+    ON billing.tariffs (subscription_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_subscription_auto_prolong_expired
+    ON billing.user_subscription (auto_prolong, expired);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_subscription_user_id_expired
+    ON billing.user_subscription (user_id, expired);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usercard_active_user_id
+    ON billing.usercard (user_id)
+    WHERE active;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_history_transaction_id_created_at
+    ON billing.history (transaction_id, created_at DESC);
@@ -0,0 +1,37 @@
+-- Current state projection of transactions, kept in sync with history by a trigger.
+
+BEGIN;
+
+ALTER TABLE billing.transactions
+    ADD COLUMN IF NOT EXISTS state transactionstate,
+    ADD COLUMN IF NOT EXISTS state_updated_at TIMESTAMP WITHOUT TIME ZONE;
+
+CREATE OR REPLACE FUNCTION billing.sync_transaction_state() RETURNS trigger AS $$
+BEGIN
+    UPDATE billing.transactions
+    SET state = NEW.state, state_updated_at = NEW.created_at
+    WHERE id = NEW.transaction_id
+      AND (state_updated_at IS NULL OR state_updated_at <= NEW.created_at);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS history_sync_transaction_state ON billing.history;
+CREATE TRIGGER history_sync_transaction_state
+    AFTER INSERT ON billing.history
+    FOR EACH ROW EXECUTE FUNCTION billing.sync_transaction_state();
+
+UPDATE billing.transactions AS t
+SET state = h.state, state_updated_at = h.created_at
+FROM (
+    SELECT DISTINCT ON (transaction_id) transaction_id, state, created_at
+    FROM billing.history
+    ORDER BY transaction_id, created_at DESC
+) AS h
+WHERE t.id = h.transaction_id;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_payment_wait
+    ON billing.transactions (id)
+    WHERE state = 'PAYMENT_WAIT';
@@ -0,0 +1,4 @@
+-- Expiry range index for the scheduler daily sweep over all notification cohorts.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_subscription_expired
+    ON billing.user_subscription (expired);
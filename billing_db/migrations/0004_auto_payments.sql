@@ -0,0 +1,17 @@
+-- Ledger of auto-payments submitted by the scheduler, one row per (user, tariff, billing period).
+
+BEGIN;
+
+CREATE TYPE autopaymentstate AS ENUM ('RESERVED', 'SUBMITTED', 'FAILED');
+
+CREATE TABLE IF NOT EXISTS billing.auto_payments (
+    id UUID PRIMARY KEY,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL UNIQUE,
+    user_id UUID NOT NULL,
+    tariff_id UUID NOT NULL REFERENCES billing.tariffs (id),
+    billing_period TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    state autopaymentstate NOT NULL
+);
+
+COMMIT;
@@ -0,0 +1,23 @@
+-- Outbox of notifications queued by the scan jobs and delivered by the scheduler's outbox dispatcher.
+
+BEGIN;
+
+CREATE TYPE notificationstate AS ENUM ('PENDING', 'SENT', 'FAILED');
+
+CREATE TABLE IF NOT EXISTS billing.notification_outbox (
+    id UUID PRIMARY KEY,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    dedupe_key VARCHAR(255) NOT NULL UNIQUE,
+    user_id UUID NOT NULL,
+    pattern_id VARCHAR(255) NOT NULL,
+    state notificationstate NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    sent_at TIMESTAMP WITHOUT TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_pending
+    ON billing.notification_outbox (next_attempt_at)
+    WHERE state = 'PENDING';
+
+COMMIT;
@@ -0,0 +1,4 @@
+-- Keyset index for the cursor pagination of the admin API subscriptions list.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_subscriptions_created_at_id
+    ON billing.subscriptions (created_at, id);
@@ -0,0 +1,9 @@
+-- Replace ix_usercard_user_id_active (user_id, active) with partial indexes: ix_usercard_active_user_id (0001)
+-- serves the active-card joins, ix_usercard_inactive_user_id the no-active-card lookups of the daily sweep.
+-- CONCURRENTLY cannot run inside a transaction block: apply with autocommit.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usercard_inactive_user_id
+    ON billing.usercard (user_id)
+    WHERE NOT active;
+
+DROP INDEX CONCURRENTLY IF EXISTS billing.ix_usercard_user_id_active;
@@ -0,0 +1,35 @@
+-- Keep transactions.state in sync when history rows are edited or deleted (e.g. from the admin panel),
+-- not only when they are inserted: every change recomputes the latest state of the affected transactions.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION billing.sync_transaction_state() RETURNS trigger AS $$
+DECLARE
+    affected UUID[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        affected := ARRAY[NEW.transaction_id];
+    ELSIF TG_OP = 'UPDATE' THEN
+        affected := ARRAY[OLD.transaction_id, NEW.transaction_id];
+    ELSE
+        affected := ARRAY[OLD.transaction_id];
+    END IF;
+    UPDATE billing.transactions AS t
+    SET (state, state_updated_at) = (
+        SELECT h.state, h.created_at
+        FROM billing.history AS h
+        WHERE h.transaction_id = t.id
+        ORDER BY h.created_at DESC
+        LIMIT 1
+    )
+    WHERE t.id = ANY(affected);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS history_sync_transaction_state ON billing.history;
+CREATE TRIGGER history_sync_transaction_state
+    AFTER INSERT OR UPDATE OR DELETE ON billing.history
+    FOR EACH ROW EXECUTE FUNCTION billing.sync_transaction_state();
+
+COMMIT;
@@ -0,0 +1,17 @@
+-- Reservation time of auto-payments: a key still RESERVED long after it was reserved got no outcome
+-- (the run died mid-page or the payment service did not answer) and is sent again under the same key.
+
+BEGIN;
+
+ALTER TABLE billing.auto_payments
+    ADD COLUMN IF NOT EXISTS reserved_at TIMESTAMP WITHOUT TIME ZONE;
+
+UPDATE billing.auto_payments SET reserved_at = created_at WHERE reserved_at IS NULL;
+
+ALTER TABLE billing.auto_payments ALTER COLUMN reserved_at SET NOT NULL;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_auto_payments_reserved_at
+    ON billing.auto_payments (reserved_at)
+    WHERE state = 'RESERVED';
@@ -0,0 +1,5 @@
+-- Sent and failed outbox notifications are deleted after OUTBOX_RETENTION_DAYS by the daily purge job.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notification_outbox_completed_created_at
+    ON billing.notification_outbox (created_at)
+    WHERE state <> 'PENDING';
@@ -4,10 +4,11 @@ from datetime import datetime
 import enum
 from uuid import uuid4
 
-from sqlalchemy import Enum
+from sqlalchemy import DDL, Enum, event
 from typing_extensions import Annotated
 from sqlalchemy import (
     DateTime,
+    Index,
     MetaData,
     String,
     ForeignKey,
@@ -15,6 +16,7 @@ from sqlalchemy import (
     BOOLEAN,
     UUID,
     INTEGER,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
 
@@ -34,6 +36,18 @@ class TransactionState(enum.Enum):
     TRANSACTION_COMPLETE = "TRANSACTION COMPLETE"
 
 
+class AutoPaymentState(enum.Enum):
+    RESERVED = "RESERVED"
+    SUBMITTED = "SUBMITTED"
+    FAILED = "FAILED"
+
+
+class NotificationState(enum.Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
 class DurationUnit(enum.Enum):
     DAYS = "Days"
     MONTH = "Month"
@@ -58,6 +72,9 @@ class Base(DeclarativeBase):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_created_at_id", "created_at", "id"),
+    )
 
     name: Mapped[str] = mapped_column(String(255))
     tariffs: Mapped[list[Tariff]] = relationship("Tariff")
@@ -68,6 +85,9 @@ class Subscription(Base):
 
 class Tariff(Base):
     __tablename__ = "tariffs"
+    __table_args__ = (
+        Index("ix_tariffs_subscription_id", "subscription_id"),
+    )
 
     name: Mapped[str] = mapped_column(String(255))
     subscription_id: Mapped[uuid] = mapped_column(
@@ -89,6 +109,11 @@ class Tariff(Base):
 
 class UserSubscription(Base):
     __tablename__ = "user_subscription"
+    __table_args__ = (
+        Index("ix_user_subscription_auto_prolong_expired", "auto_prolong", "expired"),
+        Index("ix_user_subscription_user_id_expired", "user_id", "expired"),
+        Index("ix_user_subscription_expired", "expired"),
+    )
 
     subscription_id: Mapped[uuid] = mapped_column(
         UUID,
@@ -114,6 +139,10 @@ class UserFreezeSubscription(Base):
 
 class UserPaymentMethod(Base):
     __tablename__ = "usercard"
+    __table_args__ = (
+        Index("ix_usercard_active_user_id", "user_id", postgresql_where=text("active")),
+        Index("ix_usercard_inactive_user_id", "user_id", postgresql_where=text("NOT active")),
+    )
 
     user_id: Mapped[uuid]
     payment_id: Mapped[uuid]
@@ -124,16 +153,71 @@ class UserPaymentMethod(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_payment_wait", "id", postgresql_where=text("state = 'PAYMENT_WAIT'")),
+    )
 
     user_id: Mapped[uuid]
     payment_id: Mapped[UUID] = mapped_column(UUID, nullable=True)
     tariff_id: Mapped[uuid] = mapped_column(UUID, ForeignKey("billing.tariffs.id"))
     tariff: Mapped[Tariff] = relationship(Tariff)
+    # Latest History state, maintained by the history_sync_transaction_state trigger.
+    state: Mapped[str] = mapped_column(Enum(TransactionState), nullable=True)
+    state_updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
 
     def __str__(self):
         return f"{self.id}:{self.payment_id}"
 
 
+class AutoPayment(Base):
+    __tablename__ = "auto_payments"
+    __table_args__ = (
+        Index(
+            "ix_auto_payments_reserved_at",
+            "reserved_at",
+            postgresql_where=text("state = 'RESERVED'"),
+        ),
+    )
+
+    idempotency_key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    user_id: Mapped[uuid]
+    tariff_id: Mapped[uuid] = mapped_column(UUID, ForeignKey("billing.tariffs.id"))
+    billing_period: Mapped[timestamp]
+    state: Mapped[str] = mapped_column(Enum(AutoPaymentState), nullable=False)
+    # When the key was last reserved for sending, a RESERVED key older than that was never confirmed.
+    reserved_at: Mapped[timestamp] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __str__(self):
+        return f"{self.idempotency_key}:{self.state}"
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("state = 'PENDING'"),
+        ),
+        Index(
+            "ix_notification_outbox_completed_created_at",
+            "created_at",
+            postgresql_where=text("state <> 'PENDING'"),
+        ),
+    )
+
+    dedupe_key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    user_id: Mapped[uuid]
+    pattern_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    state: Mapped[str] = mapped_column(Enum(NotificationState), nullable=False)
+    attempts: Mapped[int] = mapped_column(INTEGER, default=0, nullable=False)
+    next_attempt_at: Mapped[timestamp]
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def __str__(self):
+        return f"{self.dedupe_key}:{self.state}"
+
+
 class History(Base):
     __tablename__ = "history"
 
@@ -143,3 +227,49 @@ class History(Base):
     )
     transaction: Mapped[Transaction] = relationship(Transaction)
     state: Mapped[str] = mapped_column(Enum(TransactionState), nullable=False)
+
+
+Index("ix_history_transaction_id_created_at", History.transaction_id, History.created_at.desc())
+
+event.listen(
+    History.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION billing.sync_transaction_state() RETURNS trigger AS $$
+        DECLARE
+            affected UUID[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                affected := ARRAY[NEW.transaction_id];
+            ELSIF TG_OP = 'UPDATE' THEN
+                affected := ARRAY[OLD.transaction_id, NEW.transaction_id];
+            ELSE
+                affected := ARRAY[OLD.transaction_id];
+            END IF;
+            UPDATE billing.transactions AS t
+            SET (state, state_updated_at) = (
+                SELECT h.state, h.created_at
+                FROM billing.history AS h
+                WHERE h.transaction_id = t.id
+                ORDER BY h.created_at DESC
+                LIMIT 1
+            )
+            WHERE t.id = ANY(affected);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ),
+)
+event.listen(
+    History.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE TRIGGER history_sync_transaction_state
+            AFTER INSERT OR UPDATE OR DELETE ON billing.history
+            FOR EACH ROW EXECUTE FUNCTION billing.sync_transaction_state()
+        """,
+    ),
+)
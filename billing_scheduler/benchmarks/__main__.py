@@ -0,0 +1,257 @@
+"""
+Benchmark the scheduler jobs against a seeded local Postgres and stub HTTP services.
+
+The billing schema of POSTGRES_DSN is dropped and re-created for every scale,
+and the job keys are removed from REDIS_HOST, so point both at scratch instances.
+
+Outbound calls go through a dispatcher limited to --rate-limit requests per second,
+unlimited by default, so requests/s measures the jobs rather than DISPATCH_RATE_LIMIT.
+
+    python -m benchmarks --reset --users 10000 100000 --latency 0.02 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import resource
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from sqlalchemy import event, func, select
+
+from benchmarks.seed import seed
+from benchmarks.stubs import StubServices
+from core.config import settings
+from database import postgres, redis
+from database.models import AutoPayment, NotificationOutbox, NotificationState, Transaction, TransactionState
+from services import http_client
+from services.auth import AuthService
+from services.database_service import DatabaseService
+from services.dispatcher import Dispatcher
+from services.scheduler_service import SchedulerService
+
+logger = logging.getLogger(__name__)
+
+JOBS = ("notification_scan", "notification_delivery", "auto_payment", "transaction_status")
+
+
+@dataclass
+class JobResult:
+    job: str
+    users: int
+    rows: int
+    rate_limit: float
+    wall_time: float
+    requests: int
+    queries: int
+    query_time: float
+    peak_rss_mb: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.wall_time if self.wall_time else 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.wall_time if self.wall_time else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.job:<22} users={self.users:<8} rate_limit={self.rate_limit or 'off':<6} "
+            f"wall={self.wall_time:8.2f}s "
+            f"rows/s={self.rows_per_second:10.1f} requests/s={self.requests_per_second:8.1f} "
+            f"queries={self.queries:<6} query_time={self.query_time:7.2f}s peak_rss={self.peak_rss_mb:.0f}MB"
+        )
+
+
+class QueryTimer:
+    """Count statements executed by the engine and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.total = 0.0
+        event.listen(postgres.engine.sync_engine, "before_cursor_execute", self.before)
+        event.listen(postgres.engine.sync_engine, "after_cursor_execute", self.after)
+
+    def reset(self) -> None:
+        self.queries = 0
+        self.total = 0.0
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries += 1
+        self.total += perf_counter() - conn.info["query_started"].pop()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def clear_job_keys() -> None:
+    for prefix in (
+        settings.redis.checkpoint_key,
+        settings.polling.key_prefix,
+        settings.shard.key_prefix,
+        settings.lock.key_prefix,
+    ):
+        async for key in redis.redis_interface.scan_iter(match=f"{prefix}:*"):
+            await redis.redis_interface.delete(key)
+
+
+async def run_job(service: SchedulerService, job: str) -> None:
+    if job == "notification_scan":
+        await service.send_daily_notifications()
+    elif job == "notification_delivery":
+        while await service.dispatch_outbox():
+            pass
+    elif job == "auto_payment":
+        await service.check_users_to_auto_pay()
+    else:
+        await service.check_transaction_status()
+
+
+async def benchmark(
+    users: int,
+    transactions: int,
+    jobs: list[str],
+    stubs: StubServices,
+    auth_client: AuthService,
+    dispatcher: Dispatcher,
+    timer: QueryTimer,
+    report: Callable[[JobResult], Awaitable[None]],
+) -> None:
+    await postgres.purge_database()
+    await postgres.create_database()
+    started = perf_counter()
+    await seed(postgres.engine, users, transactions)
+    logger.warning("Seeded %d users and %d transactions in %.1fs", users, transactions, perf_counter() - started)
+    await clear_job_keys()
+    for job in jobs:
+        stubs.requests.clear()
+        timer.reset()
+        async with postgres.async_session() as session:
+            service = SchedulerService(DatabaseService(session), dispatcher=dispatcher, auth_client=auth_client)
+            started = perf_counter()
+            await run_job(service, job)
+            wall_time = perf_counter() - started
+            timer_queries, timer_total = timer.queries, timer.total
+            rows = await count_rows(service, job)
+        await report(
+            JobResult(
+                job=job,
+                users=users,
+                rows=rows,
+                rate_limit=dispatcher.rate_limit,
+                wall_time=wall_time,
+                requests=sum(stubs.requests.values()),
+                queries=timer_queries,
+                query_time=timer_total,
+                peak_rss_mb=peak_rss_mb(),
+            ),
+        )
+
+
+async def count_rows(service: SchedulerService, job: str) -> int:
+    """
+    Number of rows the job went through: queued or sent outbox rows for the notification jobs,
+    ledger rows of the charged users for auto-payment and the polled PAYMENT_WAIT transactions.
+    """
+    session = service.database.session
+    if job == "notification_scan":
+        return await session.scalar(select(func.count()).select_from(NotificationOutbox))
+    if job == "notification_delivery":
+        return await session.scalar(select(func.count()).where(NotificationOutbox.state == NotificationState.SENT))
+    if job == "auto_payment":
+        return await session.scalar(select(func.count()).select_from(AutoPayment))
+    return await session.scalar(select(func.count()).where(Transaction.state == TransactionState.PAYMENT_WAIT))
+
+
+async def main(args: argparse.Namespace) -> None:
+    stubs = StubServices(args.latency)
+    await stubs.start()
+    settings.job.notification_url = f"{stubs.url}/notification"
+    settings.job.notification_batch_url = f"{stubs.url}/notification/batch" if args.batch else None
+    SchedulerService.batch_supported = args.batch
+    settings.job.payment_status = f"{stubs.url}/payment/status"
+    settings.job.auto_payment = f"{stubs.url}/payment/auto"
+    http_client.http_session = http_client.create_http_session()
+    redis.redis_interface = Redis(host=settings.redis.host, port=settings.redis.port)
+    auth_client = AuthService(
+        username="benchmark",
+        password="benchmark",
+        login_url=f"{stubs.url}/auth/login",
+        refresh_url=f"{stubs.url}/auth/refresh",
+    ).connections(http_client.http_session)
+    await auth_client.start(settings.x_request_id)
+    dispatcher = Dispatcher(settings.dispatch.max_in_flight, args.rate_limit, settings.dispatch.burst)
+    timer = QueryTimer()
+    results: list[JobResult] = []
+
+    async def report(result: JobResult) -> None:
+        results.append(result)
+        print(result, flush=True)
+
+    try:
+        for users in args.users:
+            await benchmark(
+                users,
+                args.transactions if args.transactions is not None else users // 10,
+                args.jobs,
+                stubs,
+                auth_client,
+                dispatcher,
+                timer,
+                report,
+            )
+    finally:
+        await auth_client.close()
+        await http_client.http_session.close()
+        await redis.redis_interface.close()
+        await postgres.engine.dispose()
+        await stubs.stop()
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(
+                [
+                    {
+                        **asdict(result),
+                        "rows_per_second": result.rows_per_second,
+                        "requests_per_second": result.requests_per_second,
+                    }
+                    for result in results
+                ],
+                file,
+                indent=2,
+            )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000], help="data set sizes to benchmark")
+    parser.add_argument("--transactions", type=int, help="transactions per data set, users / 10 by default")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub service response delay, seconds")
+    parser.add_argument("--jobs", nargs="+", choices=JOBS, default=list(JOBS), help="jobs to run, in order")
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="outbound requests per second, 0 (the default) disables the DISPATCH_RATE_LIMIT limiter",
+    )
+    parser.add_argument("--no-batch", dest="batch", action="store_false", help="disable batch notifications")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--reset", action="store_true", help="confirm dropping the billing schema of POSTGRES_DSN")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the job logs")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("the benchmark drops the billing schema of POSTGRES_DSN, pass --reset to confirm")
+    return args
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    logging.basicConfig(level=logging.INFO if arguments.verbose else logging.WARNING)
+    asyncio.run(main(arguments))
@@ -0,0 +1,132 @@
+import datetime as dt
+import logging
+import random
+from typing import Iterator
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database.models import (
+    DurationUnit,
+    History,
+    Subscription,
+    Tariff,
+    Transaction,
+    TransactionState,
+    UserPaymentMethod,
+    UserSubscription,
+)
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS = 10
+BATCH_SIZE = 5000
+
+
+def batched(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def seed(engine: AsyncEngine, users: int, transactions: int, seed_value: int = 0) -> None:
+    """
+    Fill an empty billing schema with synthetic subscriptions, cards and transactions.
+
+    Subscriptions expire uniformly over the next week, so every notification cohort
+    and the auto-payment window get a share of the users.
+
+    Args:
+        engine (AsyncEngine): Engine of the benchmark database.
+        users (int): Number of users, each with one subscription and one card.
+        transactions (int): Number of transactions, half of them waiting for payment.
+        seed_value (int): Random seed, the same seed produces the same data set.
+    """
+    rng = random.Random(seed_value)
+    now = dt.datetime.utcnow()
+    subscriptions = [{"id": uuid4(), "created_at": now, "name": f"subscription {i}"} for i in range(SUBSCRIPTIONS)]
+    tariffs = [
+        {
+            "id": uuid4(),
+            "created_at": now,
+            "name": f"tariff {i}",
+            "subscription_id": subscription["id"],
+            "duration": 1,
+            "duration_unit": DurationUnit.MONTH,
+            "price": 299,
+            "repeat": True,
+        }
+        for i, subscription in enumerate(subscriptions)
+    ]
+    user_ids = [uuid4() for _ in range(users)]
+
+    def user_subscriptions() -> Iterator[dict]:
+        for user_id in user_ids:
+            yield {
+                "id": uuid4(),
+                "created_at": now,
+                "subscription_id": rng.choice(subscriptions)["id"],
+                "user_id": user_id,
+                "expired": now + dt.timedelta(seconds=rng.uniform(0, 7 * 24 * 3600)),
+                "auto_prolong": rng.random() < 0.7,
+            }
+
+    def user_cards() -> Iterator[dict]:
+        for user_id in user_ids:
+            yield {
+                "id": uuid4(),
+                "created_at": now,
+                "user_id": user_id,
+                "payment_id": uuid4(),
+                "type": "bank_card",
+                "title": "**** 4242",
+                "active": rng.random() < 0.8,
+            }
+
+    transaction_rows = [
+        {
+            "id": uuid4(),
+            "created_at": now,
+            "user_id": rng.choice(user_ids),
+            "payment_id": uuid4(),
+            "tariff_id": rng.choice(tariffs)["id"],
+        }
+        for _ in range(transactions)
+    ]
+
+    def history() -> Iterator[dict]:
+        for i, transaction in enumerate(transaction_rows):
+            yield {
+                "id": uuid4(),
+                "created_at": now,
+                "transaction_id": transaction["id"],
+                "state": TransactionState.TRANSACTION_START,
+            }
+            yield {
+                "id": uuid4(),
+                "created_at": now + dt.timedelta(seconds=1),
+                "transaction_id": transaction["id"],
+                "state": TransactionState.PAYMENT_WAIT if i % 2 else TransactionState.PAYMENT_SUCCESS,
+            }
+
+    async with engine.begin() as conn:
+        for model, rows in (
+            (Subscription, iter(subscriptions)),
+            (Tariff, iter(tariffs)),
+            (UserSubscription, user_subscriptions()),
+            (UserPaymentMethod, user_cards()),
+            (Transaction, iter(transaction_rows)),
+            (History, history()),
+        ):
+            inserted = 0
+            for batch in batched(rows, BATCH_SIZE):
+                await conn.execute(insert(model), batch)
+                inserted += len(batch)
+            logger.info("Seeded %d rows into %s", inserted, model.__tablename__)
+        await conn.exec_driver_sql("ANALYZE")
@@ -0,0 +1,67 @@
+import asyncio
+from collections import Counter
+from time import time
+
+import jwt
+from aiohttp import web
+
+
+class StubServices:
+    def __init__(self, latency: float, host: str = "127.0.0.1", port: int = 0):
+        """
+        Local stand-ins for the auth, notification and payment services.
+
+        Every endpoint answers after `latency` seconds and counts its requests.
+
+        Args:
+            latency (float): Response delay of every endpoint, in seconds.
+            host (str): Interface to listen on.
+            port (int): Port to listen on, a free one by default.
+        """
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.requests: Counter[str] = Counter()
+        self.runner: web.AppRunner | None = None
+        self.app = web.Application()
+        self.app.add_routes(
+            [
+                web.post("/auth/login", self.tokens),
+                web.post("/auth/refresh", self.tokens),
+                web.post("/notification", self.accepted),
+                web.post("/notification/batch", self.accepted),
+                web.get("/payment/status", self.accepted),
+                web.post("/payment/auto", self.accepted),
+            ],
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def tokens(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        await asyncio.sleep(self.latency)
+        exp = int(time()) + 3600
+        return web.json_response(
+            {
+                "access_token": jwt.encode({"exp": exp}, "benchmark"),
+                "refresh_token": jwt.encode({"exp": exp * 2}, "benchmark"),
+            },
+        )
+
+    async def accepted(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response({})
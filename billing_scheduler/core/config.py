@@ -1,4 +1,9 @@
 import os
+from opentelemetry import trace
+from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from pydantic import HttpUrl, PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -6,6 +11,13 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class PostgresSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="postgres_")
     dsn: PostgresDsn
+    pool_enabled: bool = True
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = True
+    pool_recycle: int = 1800
+    statement_cache_size: int = 100
 
 
 class AuthSettings(BaseSettings):
@@ -14,6 +26,8 @@ class AuthSettings(BaseSettings):
     refresh_url: HttpUrl
     username: str
     password: str
+    refresh_before: float = 30.0
+    retry_interval: float = 5.0
 
 
 class LogstashSettings(BaseSettings):
@@ -36,6 +50,8 @@ class RedisSettings(BaseSettings):
     port: int
     jobs_key: str
     run_times_key: str
+    checkpoint_key: str = "billing_jobs_checkpoint"
+    checkpoint_ttl: int = 172800
 
     model_config = SettingsConfigDict(env_prefix="redis_")
 
@@ -44,10 +60,85 @@ class JobSettings(BaseSettings):
     notification_url: str
     payment_status: str
     auto_payment: str
+    notification_batch_url: str | None = None
+    notification_batch_size: int = 100
+    page_size: int = 1000
+    auto_payment_retry_after: int = 1800
 
     model_config = SettingsConfigDict(env_prefix="job_")
 
 
+class DispatchSettings(BaseSettings):
+    max_in_flight: int = 50
+    rate_limit: float = 100.0
+    burst: int = 100
+
+    model_config = SettingsConfigDict(env_prefix="dispatch_")
+
+
+class HttpSettings(BaseSettings):
+    limit: int = 100
+    limit_per_host: int = 50
+    keepalive_timeout: float = 30.0
+    ttl_dns_cache: int = 300
+    timeout: float = 30.0
+
+    model_config = SettingsConfigDict(env_prefix="http_")
+
+
+class PollingSettings(BaseSettings):
+    key_prefix: str = "billing_payment_poll"
+    base_delay: float = 240.0
+    max_delay: float = 21600.0
+    lease: int = 300
+    state_ttl: int = 604800
+
+    model_config = SettingsConfigDict(env_prefix="polling_")
+
+
+class ShardSettings(BaseSettings):
+    count: int = 1
+    key_prefix: str = "billing_jobs_shard"
+    lease: float = 60.0
+    heartbeat: float = 20.0
+    poll_interval: float = 5.0
+
+    model_config = SettingsConfigDict(env_prefix="shard_")
+
+
+class OutboxSettings(BaseSettings):
+    batch_size: int = 1000
+    lease: int = 300
+    poll_interval: float = 5.0
+    retry_delay: int = 60
+    max_attempts: int = 5
+    retention_days: int = 7
+
+    model_config = SettingsConfigDict(env_prefix="outbox_")
+
+
+class LockSettings(BaseSettings):
+    key_prefix: str = "billing_jobs_lock"
+    lease: float = 60.0
+    heartbeat: float = 20.0
+
+    model_config = SettingsConfigDict(env_prefix="lock_")
+
+
+class MetricsSettings(BaseSettings):
+    enabled: bool = True
+    host: str = "0.0.0.0"
+    port: int = 9100
+
+    model_config = SettingsConfigDict(env_prefix="metrics_")
+
+
+class JaegerSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="jaeger_")
+    agent_host_name: str = "jaeger-tracing"
+    agent_port: int = 6831
+
+
 class AppSettings:
     postgres = PostgresSettings()
     redis = RedisSettings()
@@ -55,8 +146,29 @@ class AppSettings:
     logstash = LogstashSettings()
     job = JobSettings()
     pattern = PatternSettings()
+    dispatch = DispatchSettings()
+    http = HttpSettings()
+    polling = PollingSettings()
+    shard = ShardSettings()
+    lock = LockSettings()
+    outbox = OutboxSettings()
+    metrics = MetricsSettings()
+    jaeger = JaegerSettings()
+    tracer_enable = bool(int(os.getenv("TRACER_ENABLE", "0")))
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     x_request_id = os.getenv("SERVICE_X_REQUEST_ID")
 
 
 settings = AppSettings()
+
+
+def configure_tracer() -> None:
+    resource = Resource(attributes={"service.name": "billing_scheduler"})
+    trace.set_tracer_provider(TracerProvider(resource=resource))
+    trace.get_tracer_provider().add_span_processor(
+        BatchSpanProcessor(JaegerExporter(**settings.jaeger.model_dump())),
+    )
+
+
+if settings.tracer_enable:
+    configure_tracer()
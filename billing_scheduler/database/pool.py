@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from time import perf_counter
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    checkins: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+    def __str__(self):
+        return (
+            f"pool: checkouts={self.checkouts} checkins={self.checkins} timeouts={self.timeouts} "
+            f"wait_avg={self.wait_avg * 1000:.2f}ms wait_max={self.wait_max * 1000:.2f}ms"
+        )
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout counts and the time spent waiting for a connection."""
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        wait = perf_counter() - started
+        pool_metrics.checkouts += 1
+        pool_metrics.wait_total += wait
+        pool_metrics.wait_max = max(pool_metrics.wait_max, wait)
+        return connection
+
+    def _do_return_conn(self, record):
+        pool_metrics.checkins += 1
+        super()._do_return_conn(record)
@@ -1,6 +1,7 @@
 from core.config import settings
 from database.models import Base
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from database.pool import MeteredQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import NullPool
 from sqlalchemy.schema import CreateSchema
 
@@ -16,9 +17,27 @@ async def purge_database() -> None:
         await conn.run_sync(Base.metadata.drop_all)
 
 
-engine = create_async_engine(
-    str(settings.postgres.dsn),
-    future=True,
-    poolclass=NullPool,
-)
+def create_engine() -> AsyncEngine:
+    connect_args = {"statement_cache_size": settings.postgres.statement_cache_size}
+    if not settings.postgres.pool_enabled:
+        return create_async_engine(
+            str(settings.postgres.dsn),
+            future=True,
+            poolclass=NullPool,
+            connect_args=connect_args,
+        )
+    return create_async_engine(
+        str(settings.postgres.dsn),
+        future=True,
+        poolclass=MeteredQueuePool,
+        pool_size=settings.postgres.pool_size,
+        max_overflow=settings.postgres.max_overflow,
+        pool_timeout=settings.postgres.pool_timeout,
+        pool_pre_ping=settings.postgres.pool_pre_ping,
+        pool_recycle=settings.postgres.pool_recycle,
+        connect_args=connect_args,
+    )
+
+
+engine = create_engine()
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
@@ -0,0 +1,7 @@
+from redis.asyncio import Redis
+
+redis_interface: Redis
+
+
+async def get_redis_client() -> Redis:
+    return redis_interface  # noqa
@@ -1,36 +1,39 @@
 import asyncio
 import logging
 
+from apscheduler.jobstores.base import JobLookupError
+from redis.asyncio import Redis
+
+from core.config import settings
+from database import postgres, redis
 from scheduler.scheduler import scheduler
 from scheduler import jobs
+from services import auth, http_client, metrics
+
+# Separate 12:00 notification jobs replaced by the daily sweep, still stored in the Redis job store.
+REPLACED_JOB_IDS = (
+    '9158024c-0a50-441d-900a-3fc74aa5e76a',
+    'df09ef87-013e-4142-9089-f6dcd8a5160c',
+    '84c8d3a4-209b-4191-83de-6ae67566011e',
+)
 
 logging.basicConfig()
 logging.getLogger("apscheduler").setLevel(logging.DEBUG)
 
 
 async def main():
+    metrics_server = await metrics.start_metrics_server() if settings.metrics.enabled else None
+    metrics.JobObserver(scheduler)
+    http_client.http_session = http_client.create_http_session()
+    redis.redis_interface = Redis(host=settings.redis.host, port=settings.redis.port)
+    auth.auth_interface = auth.AuthService(**settings.auth.model_dump()).connections(http_client.http_session)
+    await auth.auth_interface.start(settings.x_request_id)
     scheduler.add_job(
-        jobs.send_notification_tomorrow_auto_pay_job,
-        "cron",
-        hour="12",
-        misfire_grace_time=43200,
-        id='9158024c-0a50-441d-900a-3fc74aa5e76a',
-        replace_existing=True,
-    )
-    scheduler.add_job(
-        jobs.send_notification_no_active_card_job,
+        jobs.send_daily_notifications_job,
         "cron",
         hour="12",
         misfire_grace_time=43200,
-        id='df09ef87-013e-4142-9089-f6dcd8a5160c',
-        replace_existing=True,
-    )
-    scheduler.add_job(
-        jobs.send_notification_no_auto_pay_job,
-        "cron",
-        hour="12",
-        misfire_grace_time=43200,
-        id='84c8d3a4-209b-4191-83de-6ae67566011e',
+        id='5b0c0f7e-3f0a-4c8e-9d4f-6a2f1e7d9b31',
         replace_existing=True,
     )
     scheduler.add_job(
@@ -49,12 +52,34 @@ async def main():
         id='cd1d6c3d-f64f-4fd7-bbe1-6c2096073884',
         replace_existing=True,
     )
+    scheduler.add_job(
+        jobs.purge_outbox_job,
+        "cron",
+        hour="3",
+        misfire_grace_time=43200,
+        id='0f3b6e2a-8c71-4d59-a4e2-7b19c5d8e640',
+        replace_existing=True,
+    )
     scheduler.start()
+    outbox_dispatcher = asyncio.create_task(jobs.run_outbox_dispatcher())
+    for job_id in REPLACED_JOB_IDS:
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
     try:
         while True:  # noqa
             await asyncio.sleep(3)
     except KeyboardInterrupt:
         scheduler.shutdown()
+    finally:
+        outbox_dispatcher.cancel()
+        await auth.auth_interface.close()
+        await http_client.http_session.close()
+        await redis.redis_interface.close()
+        await postgres.engine.dispose()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
 
 
 if __name__ == "__main__":
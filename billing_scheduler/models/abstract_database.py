@@ -1,6 +1,9 @@
+import datetime as dt
 from abc import ABC, abstractmethod
 from uuid import UUID
 
+from models.notification import NotificationCohort
+
 
 class AbstractDatabase(ABC):
     """
@@ -8,45 +11,183 @@ class AbstractDatabase(ABC):
     """
 
     @abstractmethod
-    async def get_users_with_no_auto_pay(self) -> list[UUID]:
+    def with_shard(self, index: int, count: int) -> "AbstractDatabase":
+        """
+        Return a database service whose user pages only contain the users of one shard.
+
+        Args:
+            index (int): The shard index.
+            count (int): The number of shards.
+
+        Returns:
+            AbstractDatabase: The sharded database service.
+        """
+        pass
+
+    @abstractmethod
+    async def get_users_to_pay_with_auto_prolong_page(
+        self,
+        after: tuple[UUID, ...] | None,
+        limit: int,
+    ) -> tuple[list[tuple[UUID, UUID, dt.datetime]], tuple[UUID, ...] | None]:
+        """
+        Retrieve one keyset page of users with an active card
+        whose subscriptions are prolonged automatically and expire in 1-2 days.
+
+        Args:
+            after (tuple[UUID, ...] | None): Key of the last row of the previous page, None for the first page.
+            limit (int): Maximum number of rows in the page.
+
+        Returns:
+            tuple[list[tuple[UUID, UUID, dt.datetime]], tuple[UUID, ...] | None]: Page of user UUID, tariff UUID and
+                subscription expiry and the key of its last row.
+        """
+        pass
+
+    @abstractmethod
+    async def get_transactions_with_waiting_payment_status_page(
+        self,
+        after: tuple[UUID, ...] | None,
+        limit: int,
+    ) -> tuple[list[tuple[UUID, dt.datetime]], tuple[UUID, ...] | None]:
+        """
+        Retrieve one keyset page of transactions
+        whose latest state is waiting payment.
+
+        Args:
+            after (tuple[UUID, ...] | None): Key of the last row of the previous page, None for the first page.
+            limit (int): Maximum number of rows in the page.
+
+        Returns:
+            tuple[list[tuple[UUID, datetime]], tuple[UUID, ...] | None]: Page of transaction UUID
+                and creation time, and the key of its last row.
+        """
+        pass
+
+    @abstractmethod
+    async def get_daily_sweep_page(
+        self,
+        after: tuple[UUID, ...] | None,
+        limit: int,
+    ) -> tuple[list[tuple[UUID, NotificationCohort]], tuple[UUID, ...] | None]:
         """
-        Retrieve users who do not have auto-pay enabled
-        and have subscriptions expiring in 2-3 days.
+        Retrieve one keyset page of subscriptions expiring in 1-3 days,
+        each classified into its notification cohort in the same query.
+
+        Args:
+            after (tuple[UUID, ...] | None): Key of the last row of the previous page, None for the first page.
+            limit (int): Maximum number of rows in the page.
 
         Returns:
-            list[UUID]: List results containing users UUID without auto-pay.
+            tuple[list[tuple[UUID, NotificationCohort]], tuple[UUID, ...] | None]: Page of user UUID
+                and cohort pairs and the key of its last row.
         """
         pass
 
     @abstractmethod
-    async def get_users_with_no_active_card(self) -> list[UUID]:
+    async def reserve_auto_payments(self, payments: list[dict], reserved_before: dt.datetime) -> dict[str, bool]:
         """
-        Retrieve users with auto-pay enabled whose subscriptions expire in 2-3 days
-        but have no active payment method.
+        Reserve auto-payments in the ledger before they are sent.
+
+        A new key, a key whose previous attempt was rejected and a key left reserved since before
+        `reserved_before` are reserved. Submitted keys and keys reserved later, possibly still in flight
+        in another run, are skipped, so concurrent runs never send the same key at once.
+
+        Args:
+            payments (list[dict]): Ledger rows with idempotency_key, user_id, tariff_id and billing_period.
+            reserved_before (dt.datetime): Keys reserved earlier than this are reserved again.
 
         Returns:
-            list[UUID]: List result containing users UUID with no active card.
+            dict[str, bool]: Idempotency keys reserved by this call, True for the keys new to the ledger.
         """
         pass
 
     @abstractmethod
-    async def get_users_with_tomorrow_payment_auto_pay(self) -> list[UUID]:
+    async def claim_stale_auto_payments(
+        self,
+        reserved_before: dt.datetime,
+        limit: int,
+    ) -> list[tuple[str, UUID, UUID]]:
         """
-        Retrieve users with auto-pay enabled
-        whose subscriptions expire in 1-2 days.
+        Reserve again the auto-payments left reserved, without an outcome, since before the given time.
+
+        Args:
+            reserved_before (datetime): Reservations older than this are stale.
+            limit (int): Maximum number of payments to claim.
 
         Returns:
-            list[UUID]: List result containing users UUID with auto-pay scheduled for tomorrow.
+            list[tuple[str, UUID, UUID]]: Idempotency key, user UUID and tariff UUID of the claimed payments.
         """
         pass
 
     @abstractmethod
-    async def get_transactions_with_waiting_payment_status(self) -> list[UUID]:
+    async def complete_auto_payments(self, submitted: list[str], failed: list[str]) -> None:
         """
-        Retrieve transactions with waiting payment status
-        and select the latest one for each transaction ID.
+        Mark reserved auto-payments as submitted or failed.
+
+        Args:
+            submitted (list[str]): Idempotency keys accepted by the payment service.
+            failed (list[str]): Idempotency keys rejected by the payment service.
+
+        Returns:
+            None
+        """
+        pass
+
+    @abstractmethod
+    async def enqueue_notifications(self, notifications: list[dict]) -> int:
+        """
+        Queue notifications in the outbox, skipping those already queued.
+
+        Args:
+            notifications (list[dict]): Outbox rows with dedupe_key, user_id and pattern_id.
+
+        Returns:
+            int: Number of notifications queued by this call.
+        """
+        pass
+
+    @abstractmethod
+    async def claim_notifications(self, limit: int, lease: int) -> list[tuple[UUID, UUID, str]]:
+        """
+        Claim due pending notifications for delivery.
+
+        Claimed notifications are hidden from other dispatchers for `lease` seconds,
+        so a dispatcher that dies mid-delivery only delays them.
+
+        Args:
+            limit (int): Maximum number of notifications to claim.
+            lease (int): Seconds the claim is held.
+
+        Returns:
+            list[tuple[UUID, UUID, str]]: Outbox UUID, user UUID and pattern ID of the claimed notifications.
+        """
+        pass
+
+    @abstractmethod
+    async def complete_notifications(self, sent: list[UUID], failed: list[UUID]) -> None:
+        """
+        Mark claimed notifications as sent, or schedule a retry of the failed ones.
+
+        Args:
+            sent (list[UUID]): Outbox UUIDs of delivered notifications.
+            failed (list[UUID]): Outbox UUIDs of notifications that failed to deliver.
+
+        Returns:
+            None
+        """
+        pass
+
+    @abstractmethod
+    async def purge_notifications(self, before: dt.datetime, limit: int) -> int:
+        """
+        Delete up to `limit` sent or failed notifications queued before `before`.
+
+        Args:
+            before (dt.datetime): Notifications queued earlier than this are deleted.
+            limit (int): Maximum number of notifications to delete.
 
         Returns:
-            list[UUID]: The result containing transactions UUID with pending status.
+            int: Number of notifications deleted.
         """
         pass
@@ -5,9 +5,10 @@ class AbstractSchedule(ABC):
     """Service for handling scheduled tasks."""
 
     @abstractmethod
-    async def send_notification_no_auto_pay_job(self) -> None:
+    async def send_daily_notifications(self) -> None:
         """
-        Send notifications to users without auto-pay enabled.
+        Queue the no-auto-pay, no-active-card and tomorrow-auto-pay notifications
+        from a single pass over subscriptions expiring in 1-3 days.
 
         Returns:
             None
@@ -15,22 +16,22 @@ class AbstractSchedule(ABC):
         pass
 
     @abstractmethod
-    async def send_notification_no_active_card(self) -> None:
+    async def dispatch_outbox(self) -> int:
         """
-        Send notifications to users without an active card.
+        Deliver a batch of notifications queued in the outbox by the notification jobs.
 
         Returns:
-            None
+            int: Number of notifications claimed for delivery.
         """
         pass
 
     @abstractmethod
-    async def send_notification_tomorrow_auto_pay(self) -> None:
+    async def purge_outbox(self) -> int:
         """
-        Send notifications to users with auto-pay scheduled for tomorrow.
+        Delete delivered and failed outbox notifications past the retention period.
 
         Returns:
-            None
+            int: Number of notifications deleted.
         """
         pass
 
@@ -58,6 +59,20 @@ class AbstractSchedule(ABC):
         """
         pass
 
+    @abstractmethod
+    async def send_notification_to_users(self, user_ids: list[str], pattern_id: str) -> bool:
+        """
+        Send a notification to a batch of users in a single request.
+
+        Args:
+            user_ids (list[str]): The user IDs.
+            pattern_id (str): The pattern ID for the notification.
+
+        Returns:
+            bool: False if the notification service does not support batches and nothing was sent.
+        """
+        pass
+
     @abstractmethod
     async def check_payment_status(self, transaction_id: str) -> None:
         """
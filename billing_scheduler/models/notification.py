@@ -0,0 +1,9 @@
+import enum
+
+
+class NotificationCohort(str, enum.Enum):
+    """Notification cohorts of the daily sweep, named after the PatternSettings fields."""
+
+    NO_AUTO_PAY = "no_auto_pay"
+    NO_ACTIVE_CARD = "no_active_card"
+    TOMORROW_AUTO_PAY = "tomorrow_auto_pay"
@@ -1,33 +1,79 @@
-from database import postgres
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable
+
+from core.config import settings
+from database import postgres, redis
 from services.database_service import DatabaseService
+from services.run_lock import RunLock
 from services.scheduler_service import SchedulerService
+from services.tracing import tracer
 
+logger = logging.getLogger(__name__)
 
-async def send_notification_tomorrow_auto_pay_job():
-    async with postgres.async_session() as session:
-        service = SchedulerService(DatabaseService(session))
-        await service.send_notification_tomorrow_auto_pay()
 
+def exclusive(sharded: bool = False):
+    """
+    Run the job under a cluster-wide lock, skipping triggers that overlap a running one.
 
-async def send_notification_no_active_card_job():
-    async with postgres.async_session() as session:
-        service = SchedulerService(DatabaseService(session))
-        await service.send_notification_no_active_card()
+    Sharded jobs are guarded by their shard leases instead, so every replica can take part.
+
+    Args:
+        sharded (bool): Whether the job splits its work with ShardCoordinator.
+    """
+
+    def decorator(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[None]]:
+        @functools.wraps(func)
+        async def wrapper():
+            with tracer.start_as_current_span(f"job {func.__name__}"):
+                if sharded and settings.shard.count > 1:
+                    await func()
+                    return
+                await RunLock(redis.redis_interface, func.__name__).run(func)
+
+        return wrapper
 
+    return decorator
 
-async def send_notification_no_auto_pay_job():
+
+@exclusive(sharded=True)
+async def send_daily_notifications_job():
     async with postgres.async_session() as session:
         service = SchedulerService(DatabaseService(session))
-        await service.send_notification_no_auto_pay_job()
+        await service.send_daily_notifications()
 
 
+@exclusive()
 async def check_transaction_status_job():
     async with postgres.async_session() as session:
         service = SchedulerService(DatabaseService(session))
         await service.check_transaction_status()
 
 
+@exclusive(sharded=True)
 async def check_users_to_auto_pay_job():
     async with postgres.async_session() as session:
         service = SchedulerService(DatabaseService(session))
         await service.check_users_to_auto_pay()
+
+
+@exclusive()
+async def purge_outbox_job():
+    async with postgres.async_session() as session:
+        service = SchedulerService(DatabaseService(session))
+        await service.purge_outbox()
+
+
+async def run_outbox_dispatcher():
+    """Deliver queued notifications continuously, polling the outbox while it is drained."""
+    while True:
+        claimed = 0
+        try:
+            async with postgres.async_session() as session:
+                service = SchedulerService(DatabaseService(session))
+                claimed = await service.dispatch_outbox()
+        except Exception:
+            logger.exception("Failed to dispatch the notification outbox")
+        if claimed < settings.outbox.batch_size:
+            await asyncio.sleep(settings.outbox.poll_interval)
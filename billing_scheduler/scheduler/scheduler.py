@@ -1,10 +1,18 @@
+import logging
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.redis import RedisJobStore
 
 from core.config import settings
+from services.run_lock import run_lock_metrics
+
+logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
+# APScheduler 3 does not coordinate schedulers sharing a job store: only one of them would
+# fire a job, so replicas running sharded jobs must use their own REDIS_JOBS_KEY/REDIS_RUN_TIMES_KEY
 jobstores = {
     "default": RedisJobStore(
         jobs_key=settings.redis.jobs_key,
@@ -14,3 +22,14 @@ jobstores = {
     ),
 }
 scheduler.configure(jobstores=jobstores)
+
+
+def count_skipped_trigger(event: JobEvent):
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        run_lock_metrics.overlapped += 1
+    else:
+        run_lock_metrics.missed += 1
+    logger.warning("Job %s trigger skipped. %s", event.job_id, run_lock_metrics)
+
+
+scheduler.add_listener(count_skipped_trigger, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
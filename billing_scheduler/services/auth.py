@@ -1,6 +1,7 @@
 from __future__ import annotations
+import asyncio
+import logging
 from typing import Any
-from asyncio import Lock
 import aiohttp
 
 from models.token import Tokens
@@ -9,6 +10,8 @@ from pydantic import HttpUrl
 from time import time
 
 
+logger = logging.getLogger(__name__)
+
 auth_interface: AuthService
 
 
@@ -17,7 +20,9 @@ async def get_auth_client() -> AuthService:
 
 
 class AuthorizationError(Exception):
-    pass  # noqa!
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status  # HTTP status of the failed response, None when no request was answered
 
 
 class AuthService:
@@ -27,6 +32,8 @@ class AuthService:
         password: str,
         login_url: HttpUrl,
         refresh_url: HttpUrl,
+        refresh_before: float = 30.0,
+        retry_interval: float = 5.0,
         **kwargs: Any,
     ):
         self.login_url = str(login_url)
@@ -34,10 +41,16 @@ class AuthService:
         self.username = username
         self.password = password
         self.session: aiohttp.ClientSession
+        self.owns_session = False
         self.refresh_token = None
         self.access_token = None
         self.access_exp = time()
-        self.lock = Lock()
+        self.refresh_before = refresh_before
+        self.retry_interval = retry_interval
+        self.refresh_task: asyncio.Task | None = None
+        self.refresh_future: asyncio.Future | None = None
+        self.logins = 0
+        self.refreshes = 0
 
     async def __aenter__(self):
         return self.connections()
@@ -45,36 +58,93 @@ class AuthService:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
-    def connections(self):
-        self.session: aiohttp.ClientSession = aiohttp.ClientSession()
+    def connections(self, session: aiohttp.ClientSession | None = None):
+        self.owns_session = session is None
+        self.session: aiohttp.ClientSession = session or aiohttp.ClientSession()
         return self
 
     async def close(self):
-        await self.session.close()
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            try:
+                await self.refresh_task
+            except asyncio.CancelledError:
+                pass
+            self.refresh_task = None
+        if self.owns_session:
+            await self.session.close()
+
+    async def start(self, request_id):
+        try:
+            await self.refresh_once(request_id)
+        except Exception:
+            # the scheduler still starts, the background refresher keeps retrying the login
+            logger.exception("Initial login failed, retrying in %.0fs", self.retry_interval)
+        self.refresh_task = asyncio.create_task(self._refresh_periodically(request_id))
+
+    async def _refresh_periodically(self, request_id):
+        # refresh ahead of expiry, so requests never wait on a login or refresh round-trip
+        delay = self.retry_interval if self.access_token is None else self._refresh_delay()
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh_once(request_id)
+            except Exception:
+                logger.exception("Background token refresh failed, retrying in %.0fs", self.retry_interval)
+                delay = self.retry_interval
+            else:
+                delay = self._refresh_delay()
+
+    def _refresh_delay(self) -> float:
+        return max(self.access_exp - self.refresh_before - time(), 1)
 
     async def get_query(self, url, request_id):
-        async with self.session.get(url=url, headers=await self._get_headers(request_id)) as resp:
+        headers = await self._get_headers(request_id)
+        async with self.session.get(url=url, headers=headers) as resp:
             if resp.ok:
                 return await resp.json()
             elif resp.status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.UNPROCESSABLE_ENTITY):
-                await self.refresh_tokens(request_id)
+                await self.refresh_once(request_id, headers)
                 async with self.session.get(url=url, headers=await self._get_headers(request_id)) as resp:  # noqa!
                     if resp.ok:
                         return await resp.json()
-            raise AuthorizationError(f"Error get user info. {await resp.text()}")
+            raise AuthorizationError(f"Error get user info. {await resp.text()}", resp.status)
 
-    async def post_query(self, url, request_id, data):
-        async with self.session.post(url=url, headers=await self._get_headers(request_id), json=data) as resp:
+    async def post_query(self, url, request_id, data, headers=None):
+        auth_headers = await self._get_headers(request_id)
+        async with self.session.post(url=url, headers={**auth_headers, **(headers or {})}, json=data) as resp:
             if resp.ok:
                 return await resp.json()
             elif resp.status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.UNPROCESSABLE_ENTITY):
-                await self.refresh_tokens(request_id)
-                async with self.session.post(url=url, headers=await self._get_headers(request_id), json=data) as resp:  # noqa!
+                await self.refresh_once(request_id, auth_headers)
+                auth_headers = await self._get_headers(request_id)
+                async with self.session.post(url=url, headers={**auth_headers, **(headers or {})}, json=data) as resp:  # noqa!
                     if resp.ok:
                         return await resp.json()
-            raise AuthorizationError(f"Error get user info. {await resp.text()}")
+            raise AuthorizationError(f"Error get user info. {await resp.text()}", resp.status)
+
+    async def refresh_once(self, request_id, stale_headers=None):
+        # single flight: concurrent callers share one refresh (or login) instead of starting their own
+        if self.refresh_future is None:
+            if stale_headers is not None and stale_headers["Authorization"] != f"Bearer {self.access_token}":
+                return  # the token was already replaced after these headers were built
+            self.refresh_future = asyncio.ensure_future(self._refresh_or_login(request_id))
+            self.refresh_future.add_done_callback(self._reset_refresh_future)
+        await asyncio.shield(self.refresh_future)
+
+    async def _refresh_or_login(self, request_id):
+        if self.refresh_token is None:
+            await self.get_tokens(request_id)
+        else:
+            await self.refresh_tokens(request_id)
+
+    def _reset_refresh_future(self, future: asyncio.Future):
+        self.refresh_future = None
+        if not future.cancelled():
+            future.exception()  # mark retrieved, every waiter gets it re-raised
 
     async def get_tokens(self, request_id):
+        self.logins += 1
         params = {"username": self.username, "password": self.password}
         async with self.session.post(
             url=self.login_url,
@@ -90,6 +160,7 @@ class AuthService:
                 raise AuthorizationError(f"Error receiving token. {await resp.text()}")
 
     async def refresh_tokens(self, request_id):
+        self.refreshes += 1
         headers = {
             "Authorization": f"Bearer {self.refresh_token}",
             "X-Request-Id": request_id,
@@ -106,11 +177,8 @@ class AuthService:
                 raise AuthorizationError(f"Error refresh token. {await resp.text()}")
 
     async def _get_headers(self, request_id):
-        if self.access_token is None:
-            await self.get_tokens(request_id)
-        async with self.lock:
-            if self.access_exp < time():
-                await self.refresh_tokens(request_id)
+        if self.access_token is None or self.access_exp < time():
+            await self.refresh_once(request_id)
         return {
             "Authorization": f"Bearer {self.access_token}",
             "X-Request-Id": request_id,
@@ -0,0 +1,46 @@
+import datetime as dt
+import json
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from core.config import settings
+from services.lease import current_lease
+
+
+class JobCheckpoint:
+    def __init__(self, redis: Redis, job: str, run: str | None = None):
+        """
+        Progress checkpoint of a paginated job run stored in Redis.
+
+        Args:
+            redis (Redis): The Redis client.
+            job (str): The job name.
+            run (str | None): The run identifier, today's date by default.
+        """
+        self.redis = redis
+        self.key = f"{settings.redis.checkpoint_key}:{job}:{run or dt.date.today().isoformat()}"
+
+    async def load(self) -> tuple[UUID, ...] | None:
+        """
+        Load the key of the last committed page.
+
+        Returns:
+            tuple[UUID, ...] | None: The page key, None if the run has not started yet.
+        """
+        value = await self.redis.get(self.key)
+        if value is None:
+            return None
+        return tuple(UUID(key) for key in json.loads(value))
+
+    async def commit(self, cursor: tuple[UUID, ...]) -> None:
+        value = json.dumps([str(key) for key in cursor])
+        lease = current_lease.get()
+        if lease is None:
+            await self.redis.setex(self.key, settings.redis.checkpoint_ttl, value)
+        else:
+            # a run that lost its lease must not move the checkpoint of the new owner
+            await lease.fenced_setex(self.key, settings.redis.checkpoint_ttl, value)
+
+    async def clear(self) -> None:
+        await self.redis.delete(self.key)
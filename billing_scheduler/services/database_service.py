@@ -1,64 +1,245 @@
 import datetime as dt
+from typing import Any
+from uuid import UUID
+
+from core.config import settings
 from models.abstract_database import AbstractDatabase
+from models.notification import NotificationCohort
+from services.metrics import observe_query
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
-from database.models import UserSubscription, UserPaymentMethod, History, TransactionState, Tariff
+from sqlalchemy import Select, String, select, and_, case, cast, delete, exists, func, literal, or_, tuple_, update
+from sqlalchemy.sql.elements import ColumnElement
+from database.models import (
+    AutoPayment,
+    AutoPaymentState,
+    NotificationOutbox,
+    NotificationState,
+    UserSubscription,
+    UserPaymentMethod,
+    Transaction,
+    TransactionState,
+    Tariff,
+)
 
 
 class DatabaseService(AbstractDatabase):
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        shard: tuple[int, int] | None = None,
+    ):
         """
         Initialize the DatabaseService with the provided AsyncSession.
 
         Args:
             session (AsyncSession): The asynchronous session to interact with the database.
+            shard (tuple[int, int] | None): Shard index and shard count limiting the user pages.
         """
         self.session = session
+        self.shard = shard
 
-    async def get_users_with_no_auto_pay(self):
-        current_time: dt.datetime = dt.datetime.utcnow()
-        two_days_later: dt.datetime = current_time + dt.timedelta(days=2)
-        three_days_later: dt.datetime = current_time + dt.timedelta(days=3)
-        smtp = select(UserSubscription.user_id).filter(
-            ~UserSubscription.auto_prolong,
-            UserSubscription.expired.between(two_days_later, three_days_later),
+    def with_shard(self, index, count):
+        return DatabaseService(self.session, (index, count))
+
+    @observe_query
+    async def get_users_to_pay_with_auto_prolong_page(self, after, limit):
+        return await self._get_page(
+            self._sharded(self._users_to_pay_with_auto_prolong()),
+            (UserSubscription.id, Tariff.id, UserPaymentMethod.id),
+            after,
+            limit,
+            scalars=False,
         )
-        results = await self.session.execute(smtp)
-        return list(results.scalars())
 
-    async def get_users_with_no_active_card(self):
-        current_time: dt.datetime = dt.datetime.utcnow()
-        two_days_later: dt.datetime = current_time + dt.timedelta(days=2)
-        three_days_later: dt.datetime = current_time + dt.timedelta(days=3)
-        smtp = select(UserSubscription.user_id).join(
-            UserPaymentMethod,
-            and_(
-                UserSubscription.user_id == UserPaymentMethod.user_id,
-                UserSubscription.auto_prolong,
-                UserSubscription.expired.between(two_days_later, three_days_later),
-                ~UserPaymentMethod.active,
+    @observe_query
+    async def get_transactions_with_waiting_payment_status_page(self, after, limit):
+        return await self._get_page(
+            self._transactions_with_waiting_payment_status(),
+            (Transaction.id,),
+            after,
+            limit,
+            scalars=False,
+        )
+
+    @observe_query
+    async def get_daily_sweep_page(self, after, limit):
+        return await self._get_page(
+            self._sharded(self._daily_sweep()),
+            (UserSubscription.id,),
+            after,
+            limit,
+            scalars=False,
+        )
+
+    @observe_query
+    async def reserve_auto_payments(self, payments, reserved_before):
+        if not payments:
+            return {}
+        now = dt.datetime.utcnow()
+        stmt = insert(AutoPayment).values(
+            [
+                {**payment, "state": AutoPaymentState.RESERVED, "created_at": now, "reserved_at": now}
+                for payment in payments
+            ],
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AutoPayment.idempotency_key],
+            set_={"state": AutoPaymentState.RESERVED, "reserved_at": now},
+            # a key reserved since reserved_before may still be in flight in another run
+            where=or_(
+                AutoPayment.state == AutoPaymentState.FAILED,
+                and_(AutoPayment.state == AutoPaymentState.RESERVED, AutoPayment.reserved_at < reserved_before),
             ),
+        ).returning(
+            AutoPayment.idempotency_key,
+            (AutoPayment.created_at == AutoPayment.reserved_at).label("inserted"),
         )
-        results = await self.session.execute(smtp)
-        return list(results.scalars())
+        results = await self.session.execute(stmt)
+        reserved = {key: inserted for key, inserted in results.all()}
+        await self.session.commit()
+        return reserved
 
-    async def get_users_with_tomorrow_payment_auto_pay(self):
-        current_time: dt.datetime = dt.datetime.utcnow()
-        one_day_later: dt.datetime = current_time + dt.timedelta(days=1)
-        two_days_later: dt.datetime = current_time + dt.timedelta(days=2)
-        smtp = select(UserSubscription.user_id).filter(
-            UserSubscription.auto_prolong,
-            UserSubscription.expired.between(one_day_later, two_days_later),
+    @observe_query
+    async def claim_stale_auto_payments(self, reserved_before, limit):
+        stale = select(AutoPayment.id).where(
+            AutoPayment.state == AutoPaymentState.RESERVED,
+            AutoPayment.reserved_at < reserved_before,
+        ).order_by(AutoPayment.reserved_at).limit(limit).with_for_update(skip_locked=True)
+        stmt = update(AutoPayment).where(AutoPayment.id.in_(stale)).values(
+            reserved_at=dt.datetime.utcnow(),
+        ).returning(AutoPayment.idempotency_key, AutoPayment.user_id, AutoPayment.tariff_id)
+        results = await self.session.execute(stmt)
+        claimed = list(results.all())
+        await self.session.commit()
+        return claimed
+
+    @observe_query
+    async def complete_auto_payments(self, submitted, failed):
+        for keys, state in ((submitted, AutoPaymentState.SUBMITTED), (failed, AutoPaymentState.FAILED)):
+            if keys:
+                await self.session.execute(
+                    update(AutoPayment).where(AutoPayment.idempotency_key.in_(keys)).values(state=state),
+                )
+        await self.session.commit()
+
+    @observe_query
+    async def enqueue_notifications(self, notifications):
+        if not notifications:
+            return 0
+        now = dt.datetime.utcnow()
+        stmt = insert(NotificationOutbox).values(
+            [
+                {**notification, "state": NotificationState.PENDING, "attempts": 0, "next_attempt_at": now}
+                for notification in notifications
+            ],
         )
-        results = await self.session.execute(smtp)
-        return list(results.scalars())
+        stmt = stmt.on_conflict_do_nothing(index_elements=[NotificationOutbox.dedupe_key])
+        results = await self.session.execute(stmt.returning(NotificationOutbox.id))
+        enqueued = len(results.all())
+        await self.session.commit()
+        return enqueued
 
-    async def get_users_to_pay_with_auto_prolong(self):
+    @observe_query
+    async def claim_notifications(self, limit, lease):
+        now = dt.datetime.utcnow()
+        due = select(NotificationOutbox.id).where(
+            NotificationOutbox.state == NotificationState.PENDING,
+            NotificationOutbox.next_attempt_at <= now,
+        ).order_by(NotificationOutbox.next_attempt_at).limit(limit).with_for_update(skip_locked=True)
+        stmt = update(NotificationOutbox).where(NotificationOutbox.id.in_(due)).values(
+            attempts=NotificationOutbox.attempts + 1,
+            next_attempt_at=now + dt.timedelta(seconds=lease),
+        ).returning(NotificationOutbox.id, NotificationOutbox.user_id, NotificationOutbox.pattern_id)
+        results = await self.session.execute(stmt)
+        claimed = list(results.all())
+        await self.session.commit()
+        return claimed
+
+    @observe_query
+    async def complete_notifications(self, sent, failed):
+        now = dt.datetime.utcnow()
+        if sent:
+            await self.session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id.in_(sent)).values(
+                    state=NotificationState.SENT,
+                    sent_at=now,
+                ),
+            )
+        if failed:
+            await self.session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id.in_(failed)).values(
+                    state=case(
+                        (
+                            NotificationOutbox.attempts >= settings.outbox.max_attempts,
+                            literal(NotificationState.FAILED, NotificationOutbox.state.type),
+                        ),
+                        else_=literal(NotificationState.PENDING, NotificationOutbox.state.type),
+                    ),
+                    next_attempt_at=now + dt.timedelta(seconds=settings.outbox.retry_delay),
+                ),
+            )
+        await self.session.commit()
+
+    @observe_query
+    async def purge_notifications(self, before, limit):
+        expired = select(NotificationOutbox.id).where(
+            NotificationOutbox.state != NotificationState.PENDING,
+            NotificationOutbox.created_at < before,
+        ).limit(limit)
+        results = await self.session.execute(
+            delete(NotificationOutbox).where(NotificationOutbox.id.in_(expired)).returning(NotificationOutbox.id),
+        )
+        purged = len(results.all())
+        await self.session.commit()
+        return purged
+
+    def _sharded(self, stmt: Select) -> Select:
+        if self.shard is None:
+            return stmt
+        index, count = self.shard
+        user_hash = func.hashtext(cast(UserSubscription.user_id, String))
+        return stmt.where(func.abs(user_hash % count) == index)
+
+    async def _get_page(
+        self,
+        stmt: Select,
+        keys: tuple[ColumnElement, ...],
+        after: tuple[UUID, ...] | None,
+        limit: int,
+        scalars: bool = True,
+    ) -> tuple[list[Any], tuple[UUID, ...] | None]:
+        """
+        Fetch one keyset page of the statement ordered by the key columns.
+
+        Args:
+            stmt (Select): The statement to paginate.
+            keys (tuple): Columns that uniquely identify a result row.
+            after (tuple[UUID, ...] | None): Key of the last row of the previous page.
+            limit (int): Maximum number of rows in the page.
+            scalars (bool): Return the first selected column instead of whole rows.
+
+        Returns:
+            tuple[list, tuple[UUID, ...] | None]: Page items and the key of its last row.
+        """
+        columns = stmt.selected_columns
+        stmt = stmt.with_only_columns(*keys, *columns).order_by(*keys).limit(limit)
+        if after is not None:
+            stmt = stmt.where(tuple_(*keys) > tuple_(*after))
+        rows = (await self.session.execute(stmt)).all()
+        if not rows:
+            return [], after
+        size = len(keys)
+        items = [row[size] if scalars else tuple(row[size:]) for row in rows]
+        return items, tuple(rows[-1][:size])
+
+    @staticmethod
+    def _users_to_pay_with_auto_prolong() -> Select:
         current_time: dt.datetime = dt.datetime.utcnow()
         one_day_later: dt.datetime = current_time + dt.timedelta(days=1)
         two_days_later: dt.datetime = current_time + dt.timedelta(days=2)
-        smtp = select(UserSubscription.user_id, Tariff.id).join(
+        return select(UserSubscription.user_id, Tariff.id, UserSubscription.expired).join(
             Tariff, Tariff.subscription_id == UserSubscription.subscription_id,
         ).join(
             UserPaymentMethod,
@@ -69,20 +250,48 @@ class DatabaseService(AbstractDatabase):
                 UserPaymentMethod.active,
             ),
         )
-        results = await self.session.execute(smtp)
-        return list(results.all())
-
-    async def get_transactions_with_waiting_payment_status(self):
-        subquery = select(
-            History,
-            func.row_number().over(
-                partition_by=History.transaction_id,
-                order_by=desc(History.created_at),
-            ).label("row_number"),
-        ).subquery()
-        stmt = select(subquery).where(
-            subquery.c.state == TransactionState.PAYMENT_WAIT,
-            subquery.c.row_number == 1,
+
+    @staticmethod
+    def _daily_sweep() -> Select:
+        current_time: dt.datetime = dt.datetime.utcnow()
+        one_day_later: dt.datetime = current_time + dt.timedelta(days=1)
+        two_days_later: dt.datetime = current_time + dt.timedelta(days=2)
+        three_days_later: dt.datetime = current_time + dt.timedelta(days=3)
+        has_inactive_card = exists().where(
+            UserPaymentMethod.user_id == UserSubscription.user_id,
+            ~UserPaymentMethod.active,
+        )
+        cohort = case(
+            (
+                and_(
+                    ~UserSubscription.auto_prolong,
+                    UserSubscription.expired.between(two_days_later, three_days_later),
+                ),
+                literal(NotificationCohort.NO_AUTO_PAY.value),
+            ),
+            (
+                and_(
+                    UserSubscription.auto_prolong,
+                    UserSubscription.expired.between(one_day_later, two_days_later),
+                ),
+                literal(NotificationCohort.TOMORROW_AUTO_PAY.value),
+            ),
+            (
+                and_(
+                    UserSubscription.auto_prolong,
+                    UserSubscription.expired.between(two_days_later, three_days_later),
+                    has_inactive_card,
+                ),
+                literal(NotificationCohort.NO_ACTIVE_CARD.value),
+            ),
+        )
+        return select(UserSubscription.user_id, cohort.label("cohort")).where(
+            UserSubscription.expired.between(one_day_later, three_days_later),
+            cohort.is_not(None),
+        )
+
+    @staticmethod
+    def _transactions_with_waiting_payment_status() -> Select:
+        return select(Transaction.id, Transaction.created_at).where(
+            Transaction.state == TransactionState.PAYMENT_WAIT,
         )
-        results = await self.session.execute(stmt)
-        return list(results.scalars())
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, TypeVar
+
+from core.config import settings
+from services.metrics import item_duration, items_processed
+from services.tracing import item_span
+
+logger = logging.getLogger(__name__)
+
+Item = TypeVar("Item")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        """
+        Token bucket rate limiter.
+
+        Args:
+            rate (float): Tokens added per second. Zero or less disables limiting.
+            capacity (int): Maximum number of tokens the bucket can hold (burst size).
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class DispatchStats:
+    name: str
+    processed: int = 0
+    failed: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    started: float = field(default_factory=monotonic)
+    finished: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.processed if self.processed else 0.0
+
+    def observe(self, latency: float, ok: bool) -> None:
+        self.processed += 1
+        if not ok:
+            self.failed += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def __str__(self):
+        return (
+            f"{self.name}: processed={self.processed} failed={self.failed} "
+            f"elapsed={self.elapsed:.2f}s throughput={self.throughput:.1f}/s "
+            f"latency_avg={self.latency_avg * 1000:.1f}ms latency_max={self.latency_max * 1000:.1f}ms"
+        )
+
+
+class Dispatcher:
+    def __init__(self, max_in_flight: int, rate_limit: float, burst: int):
+        """
+        Fan out async calls over a bounded worker pool.
+
+        The concurrency and rate limits hold across all runs of the dispatcher,
+        so concurrent jobs and consecutive pages share one budget.
+
+        Args:
+            max_in_flight (int): Maximum number of handler calls running at once.
+            rate_limit (float): Maximum number of handler calls started per second.
+            burst (int): Number of calls that may start at once before the rate limit applies.
+        """
+        self.max_in_flight = max_in_flight
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.bucket = TokenBucket(rate_limit, burst)
+
+    async def run(
+        self,
+        name: str,
+        items: Iterable[Item] | AsyncIterable[Item],
+        handler: Callable[[Item], Awaitable[Any]],
+        stats: DispatchStats | None = None,
+    ) -> DispatchStats:
+        """
+        Call the handler for every item and wait until all calls are finished.
+
+        A failed call is logged and counted, it does not stop the run.
+
+        Args:
+            name (str): Run name used in the report.
+            items (Iterable | AsyncIterable): Items to dispatch.
+            handler (Callable): Coroutine function called with each item.
+            stats (DispatchStats | None): Statistics to accumulate into. When given, the caller
+                owns the run and is responsible for reporting it.
+
+        Returns:
+            DispatchStats: Throughput and latency statistics of the run.
+        """
+        owns_stats = stats is None
+        stats = DispatchStats(name) if owns_stats else stats
+        tasks: set[asyncio.Task] = set()
+
+        run = name.split(":")[0]  # one series per job, not per shard
+
+        async def worker(item: Item) -> None:
+            started = monotonic()
+            ok = True
+            try:
+                with item_span(run, item):
+                    await handler(item)
+            except Exception:
+                ok = False
+                logger.exception("%s: failed to process %s", name, item)
+            finally:
+                latency = monotonic() - started
+                stats.observe(latency, ok)
+                item_duration.labels(run).observe(latency)
+                items_processed.labels(run, "ok" if ok else "failed").inc()
+
+        async def submit(item: Item) -> None:
+            await self.semaphore.acquire()
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                self.semaphore.release()
+                raise
+            task = asyncio.create_task(worker(item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            # a task cancelled before its first step never runs the worker, so it can't release the permit itself
+            task.add_done_callback(lambda _: self.semaphore.release())
+
+        try:
+            if isinstance(items, AsyncIterable):
+                async for item in items:
+                    await submit(item)
+            else:
+                for item in items:
+                    await submit(item)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except BaseException:
+            pending = list(tasks)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+        finally:
+            if owns_stats:
+                stats.finished = monotonic()
+                logger.info("%s", stats)
+        return stats
+
+
+async def chunked(items: Iterable[Item] | AsyncIterable[Item], size: int) -> AsyncIterable[list[Item]]:
+    """
+    Group items into lists of at most `size` elements.
+
+    Args:
+        items (Iterable | AsyncIterable): Items to group.
+        size (int): Maximum chunk size.
+
+    Yields:
+        list: Next chunk of items.
+    """
+    chunk: list[Item] = []
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    else:
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+# Process-wide dispatcher, its limits apply to every job run of the process.
+dispatcher = Dispatcher(**settings.dispatch.model_dump())
+
+
+def get_dispatcher() -> Dispatcher:
+    return dispatcher
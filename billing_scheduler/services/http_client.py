@@ -0,0 +1,28 @@
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+from core.config import settings
+from services.metrics import http_trace_config
+from services.tracing import http_tracing_config
+
+http_session: ClientSession
+
+
+def create_http_session() -> ClientSession:
+    """
+    Create the process-wide HTTP session with a pooled keep-alive connector.
+
+    Returns:
+        ClientSession: Session shared by all outbound calls of the scheduler.
+    """
+    connector = TCPConnector(
+        limit=settings.http.limit,
+        limit_per_host=settings.http.limit_per_host,
+        keepalive_timeout=settings.http.keepalive_timeout,
+        ttl_dns_cache=settings.http.ttl_dns_cache,
+        use_dns_cache=True,
+    )
+    return ClientSession(
+        connector=connector,
+        timeout=ClientTimeout(total=settings.http.timeout),
+        trace_configs=[http_trace_config(), http_tracing_config()],
+    )
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator
+from uuid import uuid4
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+FENCED_SETEX_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('setex', KEYS[2], ARGV[2], ARGV[3])
+end
+return false
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Innermost lease held by the running task, used to fence its Redis writes.
+current_lease: ContextVar["Lease | None"] = ContextVar("current_lease", default=None)
+
+
+class LeaseLost(Exception):
+    pass  # noqa!
+
+
+class Lease:
+    def __init__(self, redis: Redis, key: str, ttl: float, token: str | None = None):
+        """
+        Exclusive, expiring ownership of a Redis key.
+
+        Args:
+            redis (Redis): The Redis client.
+            key (str): The lease key.
+            ttl (float): Lease lifetime in seconds, renewed by heartbeats while the owner is alive.
+            token (str | None): Owner token stored in the key, a random one by default.
+        """
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = token or uuid4().hex
+        self.lost = False
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    async def extend(self) -> bool:
+        return bool(await self.redis.eval(EXTEND_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+
+    async def fenced_setex(self, key: str, ttl: int, value: str) -> None:
+        """
+        Write a key only while this lease is still held, atomically with the ownership check.
+
+        Args:
+            key (str): The key to write.
+            ttl (int): Key lifetime in seconds.
+            value (str): The value to write.
+
+        Raises:
+            LeaseLost: The lease expired and may be owned by someone else.
+        """
+        if not await self.redis.eval(FENCED_SETEX_SCRIPT, 2, self.key, key, self.token, ttl, value):
+            self.lost = True
+            raise LeaseLost(f"Lease {self.key} is lost")
+
+    async def release(self) -> None:
+        await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+
+    @asynccontextmanager
+    async def kept_alive(self, interval: float) -> AsyncIterator["Lease"]:
+        """
+        Extend the lease every `interval` seconds and release it on exit.
+
+        If the lease is lost (it expired and was taken by someone else),
+        the task holding it is cancelled so two owners never work at once.
+
+        Args:
+            interval (float): Heartbeat interval in seconds, shorter than the lease TTL.
+        """
+        owner = asyncio.current_task()
+
+        async def heartbeat() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    extended = await self.extend()
+                except Exception:
+                    logger.exception("Failed to extend lease %s", self.key)
+                    continue
+                if not extended:
+                    self.lost = True
+                    logger.error("Lease %s is lost, stopping its owner", self.key)
+                    owner.cancel()
+                    return
+
+        task = asyncio.create_task(heartbeat())
+        reset = current_lease.set(self)
+        try:
+            yield self
+        finally:
+            current_lease.reset(reset)
+            task.cancel()
+            await self.release()
@@ -0,0 +1,132 @@
+import datetime as dt
+import logging
+from http import HTTPStatus
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from core.config import settings
+from models.abstract_database import AbstractDatabase
+from services.auth import AuthorizationError
+from services.metrics import auto_payments
+
+logger = logging.getLogger(__name__)
+
+AutoPayment = tuple[str, UUID, UUID]
+
+
+class AutoPaymentLedger:
+    def __init__(self, database: AbstractDatabase, start_payment: Callable[[str, str, str], Awaitable[None]]):
+        """
+        Idempotent submission of auto-payments backed by the auto_payments table.
+
+        Every payment is reserved in the ledger under its idempotency key before it is sent
+        and is sent until the payment service confirms or rejects it, always under the same
+        Idempotency-Key, so the payment service charges it at most once.
+
+        Args:
+            database (AbstractDatabase): The database service.
+            start_payment (Callable): Coroutine function sending (user_id, tariff_id, idempotency_key).
+        """
+        self.database = database
+        self.start_payment = start_payment
+        self.submitted: list[str] = []
+        self.failed: list[str] = []
+        self.skipped = 0
+        self.resent = 0
+        self.unknown = 0
+
+    @staticmethod
+    def idempotency_key(user_id: UUID, tariff_id: UUID, billing_period: dt.datetime) -> str:
+        return f"{user_id}:{tariff_id}:{billing_period.date().isoformat()}"
+
+    @staticmethod
+    def stale_before() -> dt.datetime:
+        """Keys reserved before this time got no outcome in time and may be sent again."""
+        return dt.datetime.utcnow() - dt.timedelta(seconds=settings.job.auto_payment_retry_after)
+
+    async def reserve(self, rows: list[tuple[UUID, UUID, dt.datetime]]) -> list[AutoPayment]:
+        """
+        Reserve the page of payments and keep only those not submitted before.
+
+        Keys left reserved for longer than `JOB_AUTO_PAYMENT_RETRY_AFTER` are sent again,
+        keys reserved more recently may still be in flight in another run and are skipped.
+
+        Args:
+            rows (list[tuple[UUID, UUID, datetime]]): User UUID, tariff UUID and subscription expiry.
+
+        Returns:
+            list[AutoPayment]: Idempotency key, user UUID and tariff UUID of the payments to send.
+        """
+        payments = {
+            self.idempotency_key(user_id, tariff_id, expired): (user_id, tariff_id, expired)
+            for user_id, tariff_id, expired in rows
+        }
+        reserved = await self.database.reserve_auto_payments(
+            [
+                {"idempotency_key": key, "user_id": user_id, "tariff_id": tariff_id, "billing_period": expired}
+                for key, (user_id, tariff_id, expired) in payments.items()
+            ],
+            self.stale_before(),
+        )
+        resent = sum(not inserted for inserted in reserved.values())
+        skipped = len(payments) - len(reserved)
+        self.resent += resent
+        self.skipped += skipped
+        auto_payments.labels("reserved").inc(len(reserved) - resent)
+        auto_payments.labels("resent").inc(resent)
+        auto_payments.labels("skipped").inc(skipped)
+        if resent:
+            logger.warning("Sending again %d auto-payments left without an outcome", resent)
+        return [(key, user_id, tariff_id) for key, (user_id, tariff_id, _) in payments.items() if key in reserved]
+
+    async def claim_stale(self) -> list[AutoPayment]:
+        """
+        Claim payments reserved longer than `JOB_AUTO_PAYMENT_RETRY_AFTER` ago and never confirmed.
+
+        They were left by a run that died mid-page or got no answer (timeout or 5xx)
+        and are not selected by today's pages any more.
+
+        Returns:
+            list[AutoPayment]: Idempotency key, user UUID and tariff UUID of the payments to send again.
+        """
+        stale = await self.database.claim_stale_auto_payments(self.stale_before(), settings.job.page_size)
+        self.resent += len(stale)
+        auto_payments.labels("resent").inc(len(stale))
+        return [(key, user_id, tariff_id) for key, user_id, tariff_id in stale]
+
+    async def submit(self, payment: AutoPayment) -> None:
+        key, user_id, tariff_id = payment
+        try:
+            await self.start_payment(str(user_id), str(tariff_id), key)
+        except AuthorizationError as error:
+            if error.status is not None and error.status < HTTPStatus.INTERNAL_SERVER_ERROR:
+                # the payment service rejected the request, the key can be retried by the next run
+                self.failed.append(key)
+                auto_payments.labels("rejected").inc()
+            else:
+                self._unknown()
+            raise
+        except Exception:
+            self._unknown()
+            raise
+        self.submitted.append(key)
+        auto_payments.labels("submitted").inc()
+
+    def _unknown(self) -> None:
+        # on timeouts, connection errors and 5xx the outcome is unknown, the key stays reserved
+        # and is sent again under the same key once it is stale
+        self.unknown += 1
+        auto_payments.labels("unknown").inc()
+
+    async def complete(self) -> None:
+        """
+        Record the outcome of the dispatched page in the ledger.
+
+        Returns:
+            None
+        """
+        await self.database.complete_auto_payments(self.submitted, self.failed)
+        self.submitted, self.failed = [], []
+
+    def __str__(self):
+        return f"auto payment ledger: skipped={self.skipped} resent={self.resent} unknown={self.unknown}"
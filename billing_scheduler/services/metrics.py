@@ -0,0 +1,222 @@
+import functools
+import logging
+from time import monotonic, perf_counter
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, TypeVar
+
+from aiohttp import ClientSession, TraceConfig, TraceRequestEndParams, TraceRequestExceptionParams, web
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+    JobEvent,
+)
+from apscheduler.schedulers.base import BaseScheduler
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+from core.config import settings
+from database.pool import pool_metrics
+from services import auth
+from services.run_lock import run_lock_metrics
+from services.tracing import endpoint_name, tracer
+
+logger = logging.getLogger(__name__)
+
+Result = TypeVar("Result")
+
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, float("inf"))
+
+job_runs = Counter(
+    "scheduler_job_runs",
+    "Scheduled job triggers by outcome: ok, error, missed or skipped (max instances).",
+    ["job_id", "job", "status"],
+)
+job_duration = Histogram(
+    "scheduler_job_duration_seconds",
+    "Wall time of scheduled job runs.",
+    ["job_id", "job"],
+    buckets=JOB_BUCKETS,
+)
+items_processed = Counter(
+    "scheduler_items_processed",
+    "Items dispatched by job runs, by outcome.",
+    ["run", "status"],
+)
+item_duration = Histogram(
+    "scheduler_item_duration_seconds",
+    "Handler time of a dispatched item.",
+    ["run"],
+)
+http_requests = Counter(
+    "scheduler_http_requests",
+    "Outbound HTTP requests by endpoint and response status, 'error' when no response was received.",
+    ["endpoint", "method", "status"],
+)
+http_duration = Histogram(
+    "scheduler_http_request_duration_seconds",
+    "Outbound HTTP request latency.",
+    ["endpoint", "method"],
+)
+db_queries = Counter(
+    "scheduler_db_queries",
+    "DatabaseService queries by outcome.",
+    ["query", "status"],
+)
+db_duration = Histogram(
+    "scheduler_db_query_duration_seconds",
+    "DatabaseService query time.",
+    ["query"],
+)
+payment_polls = Counter(
+    "scheduler_payment_status_polls",
+    "Payment status poll decisions: polled, skipped_backoff or skipped_in_flight.",
+    ["result"],
+)
+auto_payments = Counter(
+    "scheduler_auto_payments",
+    "Auto-payment ledger outcomes: reserved, resent (left unconfirmed earlier), skipped, submitted, "
+    "rejected or unknown (no answer or a 5xx, re-sent later under the same key).",
+    ["result"],
+)
+outbox_notifications = Counter(
+    "scheduler_outbox_notifications",
+    "Outbox notifications by outcome: enqueued, sent, failed or purged.",
+    ["state"],
+)
+
+
+class ProcessCollector:
+    """Expose the in-process counters kept by the pool, the run lock and the auth client."""
+
+    def collect(self):
+        pool = CounterMetricFamily("scheduler_db_pool_events", "Connection pool events.", labels=["event"])
+        pool.add_metric(["checkout"], pool_metrics.checkouts)
+        pool.add_metric(["checkin"], pool_metrics.checkins)
+        pool.add_metric(["timeout"], pool_metrics.timeouts)
+        yield pool
+        yield CounterMetricFamily(
+            "scheduler_db_pool_wait_seconds",
+            "Time spent waiting for a pooled connection.",
+            value=pool_metrics.wait_total,
+        )
+        lock = CounterMetricFamily("scheduler_run_lock_events", "Run lock events.", labels=["event"])
+        for event in ("acquired", "skipped", "lost", "overlapped", "missed"):
+            lock.add_metric([event], getattr(run_lock_metrics, event))
+        yield lock
+        client = getattr(auth, "auth_interface", None)
+        if client is not None:
+            tokens = CounterMetricFamily("scheduler_auth_token_requests", "Auth token requests.", labels=["kind"])
+            tokens.add_metric(["login"], client.logins)
+            tokens.add_metric(["refresh"], client.refreshes)
+            yield tokens
+
+
+REGISTRY.register(ProcessCollector())
+
+
+def http_trace_config() -> TraceConfig:
+    """
+    Trace config recording latency and status of every request made through a session.
+
+    Returns:
+        TraceConfig: Config to pass to the ClientSession.
+    """
+
+    async def on_request_start(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        context.started = perf_counter()
+
+    async def on_request_end(session: ClientSession, context: SimpleNamespace, params: TraceRequestEndParams) -> None:
+        endpoint = endpoint_name(params.url)
+        http_duration.labels(endpoint, params.method).observe(perf_counter() - context.started)
+        http_requests.labels(endpoint, params.method, str(params.response.status)).inc()
+
+    async def on_request_exception(
+        session: ClientSession,
+        context: SimpleNamespace,
+        params: TraceRequestExceptionParams,
+    ) -> None:
+        endpoint = endpoint_name(params.url)
+        http_duration.labels(endpoint, params.method).observe(perf_counter() - context.started)
+        http_requests.labels(endpoint, params.method, "error").inc()
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+def observe_query(func: Callable[..., Awaitable[Result]]) -> Callable[..., Awaitable[Result]]:
+    """Trace a DatabaseService query method and record its duration and outcome under its name."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> Result:
+        started = perf_counter()
+        status = "ok"
+        try:
+            with tracer.start_as_current_span(f"db {func.__name__}"):
+                return await func(*args, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            db_duration.labels(func.__name__).observe(perf_counter() - started)
+            db_queries.labels(func.__name__, status).inc()
+
+    return wrapper
+
+
+class JobObserver:
+    def __init__(self, scheduler: BaseScheduler):
+        """
+        Record runs and duration of the scheduler's jobs, labelled by job ID and function name.
+
+        Args:
+            scheduler (BaseScheduler): The scheduler whose job events are observed.
+        """
+        self.scheduler = scheduler
+        self.running: dict[str, tuple[float, str]] = {}
+        scheduler.add_listener(
+            self,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES,
+        )
+
+    def __call__(self, event: JobEvent):
+        if event.code == EVENT_JOB_SUBMITTED:
+            self.running[event.job_id] = (monotonic(), self._job_name(event.job_id))
+            return
+        if event.code in (EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES):
+            status = "missed" if event.code == EVENT_JOB_MISSED else "skipped"
+            job_runs.labels(event.job_id, self._job_name(event.job_id), status).inc()
+            return
+        started, name = self.running.pop(event.job_id, (None, self._job_name(event.job_id)))
+        if started is not None:
+            job_duration.labels(event.job_id, name).observe(monotonic() - started)
+        job_runs.labels(event.job_id, name, "ok" if event.code == EVENT_JOB_EXECUTED else "error").inc()
+
+    def _job_name(self, job_id: str) -> str:
+        job = self.scheduler.get_job(job_id)
+        return job.name if job is not None else ""
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def start_metrics_server() -> web.AppRunner:
+    """
+    Serve the Prometheus metrics of the process on `METRICS_HOST:METRICS_PORT/metrics`.
+
+    Returns:
+        web.AppRunner: Runner to clean up on shutdown.
+    """
+    app = web.Application()
+    app.add_routes([web.get("/metrics", metrics)])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, settings.metrics.host, settings.metrics.port).start()
+    logger.info("Metrics are served on %s:%d/metrics", settings.metrics.host, settings.metrics.port)
+    return runner
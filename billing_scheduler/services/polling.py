@@ -0,0 +1,96 @@
+import datetime as dt
+import json
+import logging
+from time import time
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+from redis.asyncio import Redis
+
+from core.config import settings
+from services.lease import RELEASE_SCRIPT
+from services.metrics import payment_polls
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentStatusPoller:
+    def __init__(self, redis: Redis):
+        """
+        Deduplicated payment-status polling with per-transaction exponential backoff.
+
+        Every transaction keeps its poll state (attempts, next check time) in Redis,
+        so the backoff survives restarts and is shared between scheduler replicas.
+
+        Args:
+            redis (Redis): The Redis client.
+        """
+        self.redis = redis
+        self.run_id = uuid4().hex
+        self.polled = 0
+        self.skipped_backoff = 0
+        self.skipped_in_flight = 0
+
+    async def poll(self, transaction_id: str, created_at: dt.datetime, check: Callable[[str], Awaitable[None]]) -> None:
+        """
+        Call the check for the transaction unless it is backing off or already being checked.
+
+        Args:
+            transaction_id (str): The transaction ID.
+            created_at (datetime): Creation time of the transaction (UTC), the backoff grows with its age.
+            check (Callable): Coroutine function that checks the payment status.
+
+        Returns:
+            None
+        """
+        in_flight_key = self._key("in_flight", transaction_id)
+        if not await self.redis.set(in_flight_key, self.run_id, nx=True, ex=settings.polling.lease):
+            self.skipped_in_flight += 1
+            payment_polls.labels("skipped_in_flight").inc()
+            return
+        try:
+            # read under the in-flight lease, so the state is never older than the last finished check
+            state_key = self._key("state", transaction_id)
+            state = await self.redis.get(state_key)
+            state = json.loads(state) if state else {"attempts": 0, "next_check": 0}
+            if state["next_check"] > time():
+                self.skipped_backoff += 1
+                payment_polls.labels("skipped_backoff").inc()
+                return
+            try:
+                await check(transaction_id)
+                self.polled += 1
+                payment_polls.labels("polled").inc()
+            finally:
+                checked = time()
+                age = checked - created_at.replace(tzinfo=dt.timezone.utc).timestamp()
+                state["attempts"] += 1
+                state["next_check"] = checked + self.backoff(age)
+                await self.redis.set(state_key, json.dumps(state), ex=settings.polling.state_ttl)
+        finally:
+            await self.redis.eval(RELEASE_SCRIPT, 1, in_flight_key, self.run_id)
+
+    @staticmethod
+    def backoff(age: float) -> float:
+        """
+        Delay before the next check, proportional to the age of the transaction.
+
+        Each delay is as long as the transaction has already been waiting, so check times
+        grow exponentially (base, 2 * base, 4 * base, ...) up to the configured maximum.
+
+        Args:
+            age (float): Seconds since the transaction was created.
+
+        Returns:
+            float: Delay in seconds.
+        """
+        return min(max(age, settings.polling.base_delay), settings.polling.max_delay)
+
+    def _key(self, kind: str, transaction_id: str) -> str:
+        return f"{settings.polling.key_prefix}:{kind}:{transaction_id}"
+
+    def __str__(self):
+        return (
+            f"payment status polling: polled={self.polled} skipped_backoff={self.skipped_backoff} "
+            f"skipped_in_flight={self.skipped_in_flight}"
+        )
@@ -1,70 +1,335 @@
-import asyncio
-from aiohttp import ClientSession
+import datetime as dt
+import logging
+from collections import defaultdict
+from http import HTTPStatus
+from time import monotonic
+from typing import Any, Awaitable, Callable
 from urllib.parse import urlencode
+from uuid import UUID
 
 from core.config import settings
+from database import redis
+from database.pool import pool_metrics
 from models.abstract_database import AbstractDatabase
 from models.abstract_schedule import AbstractSchedule
+from services import auth, http_client
 from services.auth import AuthService
+from services.checkpoint import JobCheckpoint
+from services.dispatcher import Dispatcher, DispatchStats, chunked, get_dispatcher
+from services.ledger import AutoPaymentLedger
+from services.metrics import outbox_notifications
+from services.polling import PaymentStatusPoller
+from services.sharding import ShardCoordinator
+from services.tracing import current_request_id, tracer
+
+logger = logging.getLogger(__name__)
+
+PageGetter = Callable[[tuple[UUID, ...] | None, int], Awaitable[tuple[list, tuple[UUID, ...] | None]]]
+
+BATCH_UNSUPPORTED_STATUSES = (
+    HTTPStatus.NOT_FOUND,
+    HTTPStatus.METHOD_NOT_ALLOWED,
+    HTTPStatus.NOT_IMPLEMENTED,
+)
 
 
 class SchedulerService(AbstractSchedule):
-    def __init__(self, database: AbstractDatabase):
+    # Shared by the services of the process, so a service without batch support is only probed once.
+    batch_supported = settings.job.notification_batch_url is not None
+
+    def __init__(
+        self,
+        database: AbstractDatabase,
+        dispatcher: Dispatcher | None = None,
+        auth_client: AuthService | None = None,
+    ):
         """
         Initialize the service with the provided database service.
 
         Args:
             database (DatabaseService): The database service instance.
+            dispatcher (Dispatcher | None): The dispatcher used to fan out outbound calls.
+            auth_client (AuthService | None): The authorized client, the process-wide one by default.
         """
         self.database = database
-        self.auth = AuthService(**settings.auth.model_dump()).connections()
-
-    async def send_notification_no_auto_pay_job(self):
-        users: list = await self.database.get_users_with_no_auto_pay()
-        for user in users:
-            await self.send_notification_to_user(str(user), settings.pattern.no_auto_pay)
+        self.dispatcher = dispatcher or get_dispatcher()
+        self.auth = auth_client or auth.auth_interface
 
-    async def send_notification_no_active_card(self):
-        users: list = await self.database.get_users_with_no_active_card()
-        for user in users:
-            await self.send_notification_to_user(str(user), settings.pattern.no_active_card)
+    async def send_daily_notifications(self):
+        async def run_shard(database: AbstractDatabase, name: str):
+            await self.run_pages(
+                name,
+                database.get_daily_sweep_page,
+                lambda rows: self.enqueue_notifications(
+                    database,
+                    [(user_id, getattr(settings.pattern, cohort)) for user_id, cohort in rows],
+                ),
+                chunk_size=settings.job.page_size,
+            )
 
-    async def send_notification_tomorrow_auto_pay(self):
-        users: list = await self.database.get_users_with_tomorrow_payment_auto_pay()
-        for user in users:
-            await self.send_notification_to_user(str(user), settings.pattern.tomorrow_auto_pay)
+        await self.run_sharded("notification_daily_sweep", run_shard)
 
     async def check_users_to_auto_pay(self):
-        users: list = await self.database.get_users_to_pay_with_auto_prolong()
-        for user in users:
-            await self.start_auto_payment(str(user[0]), str(user[1]))
+        await self.resend_stale_auto_payments()
+
+        async def run_shard(database: AbstractDatabase, name: str):
+            ledger = AutoPaymentLedger(database, self.start_auto_payment)
+            await self.run_pages(
+                name,
+                database.get_users_to_pay_with_auto_prolong_page,
+                ledger.submit,
+                prepare=ledger.reserve,
+                complete=ledger.complete,
+            )
+            logger.info("%s", ledger)
+
+        await self.run_sharded("auto_payment", run_shard)
+
+    async def resend_stale_auto_payments(self):
+        """
+        Send again, under their idempotency keys, the auto-payments an earlier run left without an outcome.
+
+        Returns:
+            None
+        """
+        ledger = AutoPaymentLedger(self.database, self.start_auto_payment)
+        stats = DispatchStats("auto_payment_stale")
+        while stale := await ledger.claim_stale():
+            await self.dispatcher.run(stats.name, stale, ledger.submit, stats)
+            await ledger.complete()
+        if stats.processed:
+            stats.finished = monotonic()
+            logger.info("%s", stats)
 
     async def check_transaction_status(self):
-        transactions: list = (
-            await self.database.get_transactions_with_waiting_payment_status()
+        poller = PaymentStatusPoller(redis.redis_interface)
+        await self.run_pages(
+            "transaction_status",
+            self.database.get_transactions_with_waiting_payment_status_page,
+            lambda transaction: poller.poll(str(transaction[0]), transaction[1], self.check_payment_status),
+        )
+        logger.info("%s", poller)
+
+        await self.run_sharded(f"notification_{name}", run_shard)
+
+    @staticmethod
+    async def enqueue_notifications(database: AbstractDatabase, notifications: list[tuple[UUID, str]]) -> int:
+        """
+        Queue a page of notifications in the outbox, once per user, pattern and day.
+
+        Args:
+            database (AbstractDatabase): The database service of the run.
+            notifications (list[tuple[UUID, str]]): User UUID and pattern ID of every notification.
+
+        Returns:
+            int: Number of notifications queued.
+        """
+        today = dt.date.today().isoformat()
+        enqueued = await database.enqueue_notifications(
+            [
+                {"dedupe_key": f"{pattern_id}:{user_id}:{today}", "user_id": user_id, "pattern_id": pattern_id}
+                for user_id, pattern_id in dict.fromkeys(notifications)
+            ],
         )
-        for transaction in transactions:
-            await self.check_payment_status(str(transaction))
+        outbox_notifications.labels("enqueued").inc(enqueued)
+        return enqueued
+
+    async def dispatch_outbox(self) -> int:
+        """
+        Claim a batch of queued notifications and deliver them, grouped by pattern.
+
+        If the notification service turns out not to support batches, the rows of the rejected batches
+        are sent again one user per request, and every notification is completed on its own outcome.
+
+        Returns:
+            int: Number of notifications claimed.
+        """
+        claimed = await self.database.claim_notifications(settings.outbox.batch_size, settings.outbox.lease)
+        if not claimed:
+            return 0
+        patterns: dict[str, list[tuple[UUID, UUID]]] = defaultdict(list)
+        for outbox_id, user_id, pattern_id in claimed:
+            patterns[pattern_id].append((outbox_id, user_id))
+        size = settings.job.notification_batch_size if self.batch_supported else 1
+        batches = [
+            (pattern_id, rows[start:start + size])
+            for pattern_id, rows in patterns.items()
+            for start in range(0, len(rows), size)
+        ]
+        sent: list[UUID] = []
+        failed: list[UUID] = []
+        unbatched: list[tuple[str, list[tuple[UUID, UUID]]]] = []
+
+        async def deliver(batch: tuple[str, list[tuple[UUID, UUID]]]):
+            pattern_id, rows = batch
+            outbox_ids = [outbox_id for outbox_id, _ in rows]
+            try:
+                if len(rows) == 1:
+                    await self.send_notification_to_user(str(rows[0][1]), pattern_id)
+                elif not await self.send_notification_to_users([str(user_id) for _, user_id in rows], pattern_id):
+                    unbatched.extend((pattern_id, [row]) for row in rows)
+                    return
+            except Exception:
+                failed.extend(outbox_ids)
+                raise
+            sent.extend(outbox_ids)
+
+        await self.dispatcher.run("notification_outbox", batches, deliver)
+        if unbatched:
+            await self.dispatcher.run("notification_outbox", unbatched, deliver)
+        await self.database.complete_notifications(sent, failed)
+        outbox_notifications.labels("sent").inc(len(sent))
+        outbox_notifications.labels("failed").inc(len(failed))
+        return len(claimed)
+
+    async def purge_outbox(self) -> int:
+        """
+        Delete sent and failed outbox notifications older than the retention period.
+
+        Returns:
+            int: Number of notifications deleted.
+        """
+        before = dt.datetime.utcnow() - dt.timedelta(days=settings.outbox.retention_days)
+        purged = 0
+        while deleted := await self.database.purge_notifications(before, settings.outbox.batch_size):
+            purged += deleted
+            outbox_notifications.labels("purged").inc(deleted)
+            if deleted < settings.outbox.batch_size:
+                break
+        logger.info("notification_outbox: purged %d notifications created before %s", purged, before)
+        return purged
+
+    async def run_sharded(self, name: str, run_shard: Callable[[AbstractDatabase, str], Awaitable[Any]]):
+        """
+        Run a daily job over all users, split into shards shared with the other scheduler replicas.
+
+        With a single shard the job runs over the whole user set in this process.
+
+        Args:
+            name (str): The run name.
+            run_shard (Callable): Coroutine function called with the sharded database service
+                and the run name of the shard.
+
+        Returns:
+            None
+        """
+        if settings.shard.count <= 1:
+            await run_shard(self.database, name)
+            return
+        coordinator = ShardCoordinator(redis.redis_interface, name)
+        await coordinator.run(
+            lambda shard: run_shard(
+                self.database.with_shard(shard, settings.shard.count),
+                f"{name}:shard_{shard}",
+            ),
+        )
+
+    async def run_pages(
+        self,
+        name: str,
+        get_page: PageGetter,
+        handler: Callable[[Any], Awaitable[Any]],
+        chunk_size: int | None = None,
+        prepare: Callable[[list], Awaitable[list]] | None = None,
+        complete: Callable[[], Awaitable[Any]] | None = None,
+    ) -> DispatchStats:
+        """
+        Walk the query page by page and dispatch every page, resuming after the last committed page.
+
+        The checkpoint is committed only after all items of a page are processed,
+        so a restarted run never skips an item, at worst it repeats one page.
+
+        Args:
+            name (str): The run name, also used as the checkpoint key.
+            get_page (PageGetter): DatabaseService method returning a keyset page.
+            handler (Callable): Coroutine function called with each item (or chunk of items).
+            chunk_size (int | None): Group page items into chunks of this size before dispatching.
+            prepare (Callable | None): Coroutine function mapping page items to the items to dispatch.
+            complete (Callable | None): Coroutine function called after a page is dispatched,
+                before its checkpoint is committed.
+
+        Returns:
+            DispatchStats: Throughput and latency statistics of the run.
+        """
+        checkpoint = JobCheckpoint(redis.redis_interface, name)
+        cursor = await checkpoint.load()
+        if cursor is not None:
+            logger.info("%s: resuming after %s", name, cursor)
+        stats = DispatchStats(name)
+        logins, refreshes = self.auth.logins, self.auth.refreshes
+        try:
+            while True:
+                with tracer.start_as_current_span(f"{name} page") as span:
+                    items, last = await get_page(cursor, settings.job.page_size)
+                    span.set_attribute("items", len(items))
+                    if not items:
+                        break
+                    if prepare is not None:
+                        items = await prepare(items)
+                    await self.dispatcher.run(
+                        name,
+                        chunked(items, chunk_size) if chunk_size else items,
+                        handler,
+                        stats,
+                    )
+                    if complete is not None:
+                        await complete()
+                    cursor = last
+                    await checkpoint.commit(cursor)
+            await checkpoint.clear()
+        finally:
+            stats.finished = monotonic()
+            logger.info("%s", stats)
+            logger.info("%s: %s", name, pool_metrics)
+            logger.info(
+                "%s: auth logins=%d refreshes=%d",
+                name,
+                self.auth.logins - logins,
+                self.auth.refreshes - refreshes,
+            )
+        return stats
 
     async def send_notification_to_user(self, user_id: str, pattern_id: str):
-        async with ClientSession() as session:
-            async with session.post(
-                settings.job.notification_url,
-                params={
-                    "user_id": user_id,
-                    "pattern_id": pattern_id,
-                    "worker": "email",
-                },
-                headers={"X-Request-Id": settings.x_request_id},
-            ):
-                await asyncio.sleep(0.1)
+        async with http_client.http_session.post(
+            settings.job.notification_url,
+            params={
+                "user_id": user_id,
+                "pattern_id": pattern_id,
+                "worker": "email",
+            },
+            headers={"X-Request-Id": current_request_id()},
+        ) as resp:
+            resp.raise_for_status()
+
+    async def send_notification_to_users(self, user_ids: list[str], pattern_id: str) -> bool:
+        if not self.batch_supported:
+            return False
+        async with http_client.http_session.post(
+            settings.job.notification_batch_url,
+            json={
+                "user_ids": user_ids,
+                "pattern_id": pattern_id,
+                "worker": "email",
+            },
+            headers={"X-Request-Id": current_request_id()},
+        ) as resp:
+            if resp.status not in BATCH_UNSUPPORTED_STATUSES:
+                resp.raise_for_status()
+                return True
+        if type(self).batch_supported:
+            type(self).batch_supported = False
+            logger.warning("Batch notifications are not supported by %s", settings.job.notification_batch_url)
+        return False
 
     async def check_payment_status(self, transaction_id: str):
         params = urlencode({"transaction_id": transaction_id})
-        await self.auth.get_query(f'{settings.job.payment_status}?{params}', request_id=settings.x_request_id)
-        await asyncio.sleep(0.1)
+        await self.auth.get_query(f'{settings.job.payment_status}?{params}', request_id=current_request_id())
 
-    async def start_auto_payment(self, user_id: str, tariff_id: str):
+    async def start_auto_payment(self, user_id: str, tariff_id: str, idempotency_key: str):
         data = {"user_id": user_id, "tariff_id": tariff_id}
-        await self.auth.post_query(settings.job.auto_payment, request_id=settings.x_request_id, data=data)
-        await asyncio.sleep(0.1)
+        await self.auth.post_query(
+            settings.job.auto_payment,
+            request_id=current_request_id(),
+            data=data,
+            headers={"Idempotency-Key": idempotency_key},
+        )
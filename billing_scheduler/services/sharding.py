@@ -0,0 +1,68 @@
+import asyncio
+import datetime as dt
+import logging
+import random
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+
+from core.config import settings
+from services.lease import Lease
+
+logger = logging.getLogger(__name__)
+
+
+class ShardCoordinator:
+    def __init__(self, redis: Redis, job: str, run: str | None = None):
+        """
+        Split a job run into `SHARD_COUNT` user shards shared by all scheduler replicas.
+
+        Every replica walks the shards, takes a Redis lease on a shard nobody owns,
+        processes it and marks it done, and waits until every shard is done.
+        A shard whose owner died is picked up by a waiting replica once its lease expires.
+
+        Args:
+            redis (Redis): The Redis client.
+            job (str): The job name.
+            run (str | None): The run identifier, today's date by default.
+        """
+        self.redis = redis
+        self.prefix = f"{settings.shard.key_prefix}:{job}:{run or dt.date.today().isoformat()}"
+        self.count = settings.shard.count
+
+    async def run(self, handler: Callable[[int], Awaitable[None]]) -> list[int]:
+        """
+        Process unclaimed shards until every shard is done, waiting out the leases held by other replicas.
+
+        Args:
+            handler (Callable): Coroutine function processing one shard index.
+
+        Returns:
+            list[int]: Shards processed by this replica.
+        """
+        processed = []
+        offset = random.randrange(self.count)  # replicas start on different shards
+        pending = [(offset + step) % self.count for step in range(self.count)]
+        while pending:
+            for shard in list(pending):
+                if await self.redis.exists(self._key("done", shard)):
+                    pending.remove(shard)
+                    continue
+                lease = Lease(self.redis, self._key("lease", shard), settings.shard.lease)
+                if not await lease.acquire():
+                    continue
+                async with lease.kept_alive(settings.shard.heartbeat):
+                    # the owner may have finished the shard between the check and the acquire
+                    if not await self.redis.exists(self._key("done", shard)):
+                        await handler(shard)
+                        await self.redis.set(self._key("done", shard), 1, ex=settings.redis.checkpoint_ttl)
+                        processed.append(shard)
+                pending.remove(shard)
+            if pending:
+                logger.debug("%s: waiting for shards %s held by other replicas", self.prefix, pending)
+                await asyncio.sleep(settings.shard.poll_interval)
+        logger.info("%s: processed shards %s of %d", self.prefix, processed, self.count)
+        return processed
+
+    def _key(self, kind: str, shard: int) -> str:
+        return f"{self.prefix}:{kind}:{shard}"
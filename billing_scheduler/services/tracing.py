@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, Iterator
+from uuid import uuid4
+
+from aiohttp import ClientSession, TraceConfig, TraceRequestEndParams, TraceRequestExceptionParams
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from yarl import URL
+
+from core.config import settings
+
+tracer = trace.get_tracer("billing_scheduler")
+
+# X-Request-Id of the work the running task does, a fresh one for every dispatched item.
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> str:
+    return request_id_var.get() or settings.x_request_id
+
+
+@contextmanager
+def item_span(run: str, item: Any) -> Iterator[str]:
+    """
+    Trace the processing of one dispatched item under a request id of its own.
+
+    Args:
+        run (str): The run name.
+        item (Any): The dispatched item.
+
+    Yields:
+        str: The request id propagated in the item's outbound calls.
+    """
+    request_id = str(uuid4())
+    reset = request_id_var.set(request_id)
+    try:
+        with tracer.start_as_current_span(f"{run} item") as span:
+            span.set_attribute("request_id", request_id)
+            span.set_attribute("item", str(item)[:256])
+            yield request_id
+    finally:
+        request_id_var.reset(reset)
+
+
+def endpoint_name(url: URL) -> str:
+    """Map an outbound URL to a bounded endpoint label."""
+    endpoints = {
+        "notification": settings.job.notification_url,
+        "notification_batch": settings.job.notification_batch_url,
+        "payment_status": settings.job.payment_status,
+        "auto_payment": settings.job.auto_payment,
+        "auth_login": str(settings.auth.login_url),
+        "auth_refresh": str(settings.auth.refresh_url),
+    }
+    url = url.with_query(None)
+    for name, endpoint in endpoints.items():
+        if endpoint and url == URL(endpoint).with_query(None):
+            return name
+    return "other"
+
+
+def http_tracing_config() -> TraceConfig:
+    """
+    Trace config opening a client span for every request and propagating its context.
+
+    Returns:
+        TraceConfig: Config to pass to the ClientSession.
+    """
+
+    async def on_request_start(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        endpoint = endpoint_name(params.url)
+        context.span = tracer.start_span(
+            f"HTTP {params.method} {endpoint}",
+            kind=SpanKind.CLIENT,
+            attributes={"http.method": params.method, "http.url": str(params.url.with_query(None))},
+        )
+        propagate.inject(params.headers, context=trace.set_span_in_context(context.span))
+
+    async def on_request_end(session: ClientSession, context: SimpleNamespace, params: TraceRequestEndParams) -> None:
+        context.span.set_attribute("http.status_code", params.response.status)
+        if params.response.status >= 500:
+            context.span.set_status(Status(StatusCode.ERROR))
+        context.span.end()
+
+    async def on_request_exception(
+        session: ClientSession,
+        context: SimpleNamespace,
+        params: TraceRequestExceptionParams,
+    ) -> None:
+        context.span.record_exception(params.exception)
+        context.span.set_status(Status(StatusCode.ERROR, type(params.exception).__name__))
+        context.span.end()
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
@@ -0,0 +1,67 @@
+import asyncio
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from dotenv import dotenv_values
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.schema import CreateSchema
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# The scheduler imports its modules from its own directory, as in the container.
+sys.path.insert(0, str(ROOT))
+
+for key, value in dotenv_values(ROOT / "example.env").items():
+    os.environ.setdefault(key, value or "")
+
+# The image copies the shared models to database/models.py, load them from billing_db in the source tree.
+if not (ROOT / "database" / "models.py").exists():
+    spec = importlib.util.spec_from_file_location("database.models", ROOT.parent / "billing_db" / "models.py")
+    models = importlib.util.module_from_spec(spec)
+    sys.modules["database.models"] = models
+    spec.loader.exec_module(models)
+
+
+@pytest.fixture(scope="session")
+def postgres_dsn() -> str:
+    """DSN of a scratch Postgres from TEST_POSTGRES_DSN, the tests drop and re-create its billing schema."""
+    dsn = os.environ.get("TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("TEST_POSTGRES_DSN is not set")
+
+    async def ping() -> None:
+        engine = create_async_engine(dsn, connect_args={"timeout": 2})
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(ping())
+    except Exception as error:
+        pytest.skip(f"Postgres at TEST_POSTGRES_DSN is not available: {error}")
+    return dsn
+
+
+@pytest.fixture(scope="module")
+def billing_database(postgres_dsn: str) -> str:
+    """Empty billing schema in the scratch Postgres, created once per test module."""
+    from database.models import Base
+
+    async def reset() -> None:
+        engine = create_async_engine(postgres_dsn)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.execute(CreateSchema("billing", if_not_exists=True))
+                await conn.run_sync(Base.metadata.create_all)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(reset())
+    return postgres_dsn
@@ -0,0 +1,79 @@
+import asyncio
+from collections import Counter
+from itertools import count
+from time import time
+
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.auth import AuthService
+
+CONCURRENT_REQUESTS = 1000
+
+
+class StubAuthServer:
+    """Auth service issuing numbered tokens and a resource accepting only the latest access token."""
+
+    def __init__(self):
+        self.requests: Counter[str] = Counter()
+        self.serial = count()
+        self.access_token: str | None = None
+        app = web.Application()
+        app.add_routes(
+            [
+                web.post("/login", self.tokens),
+                web.post("/refresh", self.tokens),
+                web.get("/resource", self.resource),
+            ],
+        )
+        self.server = TestServer(app)
+
+    async def tokens(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        await asyncio.sleep(0.05)  # keep the refresh in flight while the other requests get their 401
+        exp = int(time()) + 3600
+        self.access_token = jwt.encode({"exp": exp, "serial": next(self.serial)}, "test")
+        return web.json_response(
+            {"access_token": self.access_token, "refresh_token": jwt.encode({"exp": exp}, "test")},
+        )
+
+    async def resource(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        if request.headers.get("Authorization") != f"Bearer {self.access_token}":
+            return web.json_response({}, status=401)
+        return web.json_response({})
+
+    def revoke(self) -> None:
+        self.access_token = None
+
+
+def test_concurrent_unauthorized_requests_refresh_once():
+    async def run() -> tuple[StubAuthServer, AuthService]:
+        stub = StubAuthServer()
+        await stub.server.start_server()
+        try:
+            async with AuthService(
+                username="scheduler",
+                password="password",
+                login_url=str(stub.server.make_url("/login")),
+                refresh_url=str(stub.server.make_url("/refresh")),
+            ) as client:
+                await client.start("request-id")
+                stub.revoke()
+                await asyncio.gather(
+                    *(
+                        client.get_query(str(stub.server.make_url("/resource")), "request-id")
+                        for _ in range(CONCURRENT_REQUESTS)
+                    ),
+                )
+                return stub, client
+        finally:
+            await stub.server.close()
+
+    stub, client = asyncio.run(run())
+
+    assert stub.requests["/login"] == 1
+    assert stub.requests["/refresh"] == 1
+    assert (client.logins, client.refreshes) == (1, 1)
+    assert stub.requests["/resource"] == 2 * CONCURRENT_REQUESTS
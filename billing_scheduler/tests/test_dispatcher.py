@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from services.dispatcher import Dispatcher
+
+MAX_IN_FLIGHT = 5
+
+
+async def cancel_after_submit(dispatcher: Dispatcher, items: int) -> None:
+    """Cancel a run once its items are submitted, before the workers take their first step."""
+    job = asyncio.create_task(dispatcher.run("cancelled", range(items), lambda _: asyncio.sleep(10)))
+    await asyncio.sleep(0)
+    job.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await job
+
+
+@pytest.mark.parametrize("items", [1, 3, MAX_IN_FLIGHT, 20])
+def test_cancelled_run_returns_every_permit(items):
+    dispatcher = Dispatcher(MAX_IN_FLIGHT, 0, 1)
+
+    asyncio.run(cancel_after_submit(dispatcher, items))
+
+    assert dispatcher.semaphore._value == MAX_IN_FLIGHT
+
+
+def test_run_after_cancelled_runs_is_not_blocked():
+    async def run() -> int:
+        dispatcher = Dispatcher(MAX_IN_FLIGHT, 0, 1)
+        for _ in range(MAX_IN_FLIGHT):
+            await cancel_after_submit(dispatcher, 1)
+        stats = await asyncio.wait_for(dispatcher.run("next", range(20), lambda _: asyncio.sleep(0)), 1)
+        return stats.processed
+
+    assert asyncio.run(run()) == 20
@@ -0,0 +1,110 @@
+import asyncio
+import datetime as dt
+from uuid import uuid4
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from core.config import settings
+from database.models import AutoPayment, AutoPaymentState, DurationUnit, Subscription, Tariff
+from services.database_service import DatabaseService
+from services.ledger import AutoPaymentLedger
+
+USERS = 100
+
+
+async def not_sent(user_id: str, tariff_id: str, idempotency_key: str) -> None:
+    raise AssertionError("the test reserves payments without sending them")
+
+
+async def create_tariff(sessions: async_sessionmaker) -> dt.datetime:
+    now = dt.datetime.utcnow()
+    subscription_id, tariff_id = uuid4(), uuid4()
+    async with sessions() as session:
+        await session.execute(insert(Subscription).values(id=subscription_id, created_at=now, name="subscription"))
+        await session.execute(
+            insert(Tariff).values(
+                id=tariff_id,
+                created_at=now,
+                name="tariff",
+                subscription_id=subscription_id,
+                duration=1,
+                duration_unit=DurationUnit.MONTH,
+                price=299,
+                repeat=True,
+            ),
+        )
+        await session.commit()
+    return tariff_id
+
+
+async def reserve_concurrently(dsn: str, age: dt.timedelta | None = None) -> list[list]:
+    """Reserve one page in two concurrent runs, after a first run left it reserved `age` ago when given."""
+    engine = create_async_engine(dsn, pool_size=4)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        tariff_id = await create_tariff(sessions)
+        expired = dt.datetime.utcnow() + dt.timedelta(days=1)
+        rows = [(uuid4(), tariff_id, expired) for _ in range(USERS)]
+        if age is not None:
+            async with sessions() as session:
+                await AutoPaymentLedger(DatabaseService(session), not_sent).reserve(rows)
+                await session.execute(
+                    update(AutoPayment).where(AutoPayment.tariff_id == tariff_id).values(
+                        reserved_at=dt.datetime.utcnow() - age,
+                    ),
+                )
+                await session.commit()
+
+        async def run() -> list:
+            async with sessions() as session:
+                return await AutoPaymentLedger(DatabaseService(session), not_sent).reserve(rows)
+
+        return await asyncio.gather(run(), run())
+    finally:
+        await engine.dispose()
+
+
+def test_concurrent_runs_reserve_every_payment_once(billing_database):
+    first, second = asyncio.run(reserve_concurrently(billing_database))
+
+    assert len(first) + len(second) == USERS
+    assert not {key for key, _, _ in first} & {key for key, _, _ in second}
+
+
+def test_payments_in_flight_are_not_reserved_again(billing_database):
+    first, second = asyncio.run(reserve_concurrently(billing_database, dt.timedelta(seconds=1)))
+
+    assert first == second == []
+
+
+def test_stale_payments_are_reserved_again_by_one_run(billing_database):
+    retry_after = dt.timedelta(seconds=settings.job.auto_payment_retry_after + 60)
+
+    first, second = asyncio.run(reserve_concurrently(billing_database, retry_after))
+
+    assert len(first) + len(second) == USERS
+    assert not {key for key, _, _ in first} & {key for key, _, _ in second}
+
+
+def test_rejected_payments_are_reserved_again(billing_database):
+    async def run() -> list:
+        engine = create_async_engine(billing_database)
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            tariff_id = await create_tariff(sessions)
+            rows = [(uuid4(), tariff_id, dt.datetime.utcnow()) for _ in range(USERS)]
+            async with sessions() as session:
+                ledger = AutoPaymentLedger(DatabaseService(session), not_sent)
+                keys = [key for key, _, _ in await ledger.reserve(rows)]
+                await session.execute(
+                    update(AutoPayment).where(AutoPayment.idempotency_key.in_(keys)).values(
+                        state=AutoPaymentState.FAILED,
+                    ),
+                )
+                await session.commit()
+                return await ledger.reserve(rows)
+        finally:
+            await engine.dispose()
+
+    assert len(asyncio.run(run())) == USERS
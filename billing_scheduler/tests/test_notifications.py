@@ -0,0 +1,86 @@
+import asyncio
+from math import ceil
+from uuid import uuid4
+
+import pytest
+
+from benchmarks.stubs import StubServices
+from core.config import settings
+from services import http_client
+from services.dispatcher import Dispatcher
+from services.scheduler_service import SchedulerService
+
+USERS = 250
+PATTERN_ID = "ab5d0ebb-89aa-4d46-9a0b-4d9356aebf7b"
+
+
+class OutboxDatabase:
+    """Outbox of the DatabaseService holding one claim of queued notifications."""
+
+    def __init__(self, users: int):
+        self.queued = [(uuid4(), uuid4(), PATTERN_ID) for _ in range(users)]
+        self.sent: list = []
+        self.failed: list = []
+
+    async def claim_notifications(self, limit, lease):
+        claimed, self.queued = self.queued[:limit], self.queued[limit:]
+        return claimed
+
+    async def complete_notifications(self, sent, failed):
+        self.sent.extend(sent)
+        self.failed.extend(failed)
+
+
+async def deliver(stubs: StubServices, database: OutboxDatabase) -> None:
+    http_client.http_session = http_client.create_http_session()
+    try:
+        service = SchedulerService(database, dispatcher=Dispatcher(50, 0, 1), auth_client=object())
+        while await service.dispatch_outbox():
+            pass
+    finally:
+        await http_client.http_session.close()
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_batch_mode_sends_one_request_per_chunk(monkeypatch, batch):
+    async def run() -> tuple[StubServices, OutboxDatabase]:
+        stubs = StubServices(latency=0)
+        await stubs.start()
+        try:
+            monkeypatch.setattr(settings.job, "notification_url", f"{stubs.url}/notification")
+            monkeypatch.setattr(settings.job, "notification_batch_url", f"{stubs.url}/notification/batch")
+            monkeypatch.setattr(SchedulerService, "batch_supported", batch)
+            database = OutboxDatabase(USERS)
+            await deliver(stubs, database)
+            return stubs, database
+        finally:
+            await stubs.stop()
+
+    stubs, database = asyncio.run(run())
+
+    requests = stubs.requests["/notification/batch"] + stubs.requests["/notification"]
+    assert requests == (ceil(USERS / settings.job.notification_batch_size) if batch else USERS)
+    assert len(database.sent) == USERS
+    assert not database.failed
+
+
+def test_unsupported_batch_falls_back_to_one_request_per_user(monkeypatch):
+    async def run() -> tuple[StubServices, OutboxDatabase]:
+        stubs = StubServices(latency=0)
+        await stubs.start()
+        try:
+            monkeypatch.setattr(settings.job, "notification_url", f"{stubs.url}/notification")
+            monkeypatch.setattr(settings.job, "notification_batch_url", f"{stubs.url}/notification/missing")
+            monkeypatch.setattr(SchedulerService, "batch_supported", True)
+            database = OutboxDatabase(USERS)
+            await deliver(stubs, database)
+            return stubs, database
+        finally:
+            await stubs.stop()
+
+    stubs, database = asyncio.run(run())
+
+    assert stubs.requests["/notification"] == USERS
+    assert len(database.sent) == USERS
+    assert not database.failed
+    assert SchedulerService.batch_supported is False
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.seed import seed
+from services.database_service import DatabaseService
+
+USERS = 10_000
+TRANSACTIONS = 1_000
+
+USER_SUBSCRIPTION_INDEXES = (
+    "ix_user_subscription_auto_prolong_expired",
+    "ix_user_subscription_user_id_expired",
+    "ix_user_subscription_expired",
+)
+
+# Hot-path queries and, for every table they read, the indexes it may be reached through.
+QUERIES = [
+    (
+        DatabaseService._users_to_pay_with_auto_prolong,
+        {
+            "user_subscription": USER_SUBSCRIPTION_INDEXES,
+            "usercard": ("ix_usercard_active_user_id",),
+            "tariffs": ("ix_tariffs_subscription_id", "tariffs_pkey"),
+        },
+    ),
+    (
+        DatabaseService._daily_sweep,
+        {"user_subscription": USER_SUBSCRIPTION_INDEXES, "usercard": ("ix_usercard_inactive_user_id",)},
+    ),
+    (DatabaseService._transactions_with_waiting_payment_status, {"transactions": ("ix_transactions_payment_wait",)}),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded_database(billing_database: str) -> str:
+    async def fill() -> None:
+        engine = create_async_engine(billing_database)
+        try:
+            await seed(engine, USERS, TRANSACTIONS)  # analyzes the tables once they are filled
+        finally:
+            await engine.dispose()
+
+    asyncio.run(fill())
+    return billing_database
+
+
+async def explain(dsn: str, stmt: Select) -> str:
+    engine = create_async_engine(dsn)
+    try:
+        async with engine.begin() as conn:
+            # a wide expiry window may rightly be cheaper to scan on a small data set, so only rule out
+            # scans that no index can replace: a missing index shows up as a Seq Scan or a scan of another index
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            plan = await conn.execute(text(f"EXPLAIN {sql}"))
+            return "\n".join(row[0] for row in plan)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("query, indexes", QUERIES, ids=[query.__name__ for query, _ in QUERIES])
+def test_hot_path_queries_use_indexes(seeded_database, query, indexes):
+    plan = asyncio.run(explain(seeded_database, query()))
+
+    for table, names in indexes.items():
+        assert f"Seq Scan on {table}" not in plan, plan
+        assert any(name in plan for name in names), plan